@@ -1,4 +1,5 @@
 # Promptconfig.py
+import re
 
 SYSTEM_PROMPT = """你是一个专业的Python程序判分助手。
         - 请解析提交的python编程作业，在##Begin......##End中包含有多道编程作业，每个题目主要分为几个部分：题目编号和题目内容、源代码、运行结果和小结）
@@ -91,6 +92,16 @@ def get_system_prompt(homework_id, question_id):
         print("获取系统提示词时出错")
         #return SYSTEM_PROMPT  # 返回默认提示词或适当处理
 
+def match_homework_id(title):
+    """根据作业标题匹配KNOWLEDGE_POINTS中的作业编号，匹配不到返回None"""
+    if not title:
+        return None
+    for homework_id in KNOWLEDGE_POINTS:
+        # 编号后不能紧跟数字，"作业20"不匹配"作业2"
+        if re.search(re.escape(homework_id) + r'(?!\d)', title):
+            return homework_id
+    return None
+
 def main():
     """主函数"""
     print(get_system_prompt("作业3", 1))
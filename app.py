@@ -1,35 +1,64 @@
-from flask import Flask, render_template, request, redirect, url_for, session
+from flask import Flask, render_template, request, redirect, url_for, session, jsonify, send_file, abort
+from flask import Blueprint, current_app
+from flask import Response, stream_with_context, g, has_request_context
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
-from sqlalchemy.orm import relationship  # 添加这行
+import csv
+import hmac
+import io
+import json
+import threading
+import time
+import click
+from sqlalchemy import and_, event, func
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import relationship, joinedload, deferred  # 添加这行
 from flask import flash
+from flask.cli import with_appcontext
 import os
 from werkzeug.utils import secure_filename
-from docx import Document
 
 from config import Config
-from homework_LLM_grader import PythonCodeGrader
-from python_speaking import VoiceAssistant
+import Promptconfig
+from speech_cache import speech_cache
+from grading_stream import grading_streams
+from score_parser import parse_grader_output, format_grade
+from prompt_budget import CompactionReport
+from static_analysis import analyze_submission
+from grading_queue import GradingQueue
+from grading_cache import grading_cache
+import rate_limiter
+from document_extractor import extract_docx_text
+from migrations import upgrade_schema, find_duplicate_submissions, archive_duplicate_submissions, \
+    default_archive_path
+from pagination import get_page_args, keyset_paginate
+from metrics import metrics, COUNT_BUCKETS
+from database import normalize_database_uri, engine_options, configure_engine
+from file_storage import ContentAddressedStorage
+from file_serving import send_stored_file
+from zip_stream import stream_zip, safe_archive_name
+from grade_export import grade_row, stream_csv, stream_xlsx, csv_cell
+from student_import import read_table, parse_students, import_students
+from urllib.parse import quote
+
+db = SQLAlchemy()
+
+# 所有页面和请求钩子注册在蓝图上，由create_app()注册到新创建的应用
+bp = Blueprint('main', __name__)
 
-app = Flask(__name__)
-app.config['SECRET_KEY'] = 'your-secret-key-here'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///homework.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-# 文件上传配置
-app.config['UPLOAD_FOLDER'] = 'uploads'
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB 最大文件大小
-app.config['ALLOWED_EXTENSIONS'] = {'txt', 'pdf', 'doc', 'docx'}
-
-# 确保上传目录存在
-if not os.path.exists(app.config['UPLOAD_FOLDER']):
-    os.makedirs(app.config['UPLOAD_FOLDER'])
 
 def allowed_file(filename):
     return '.' in filename and \
-           filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
+           filename.rsplit('.', 1)[1].lower() in current_app.config['ALLOWED_EXTENSIONS']
+
+
+def get_upload_storage():
+    return current_app.extensions['upload_storage']
+
 
-db = SQLAlchemy(app)
+def get_grading_queue():
+    return current_app.extensions['grading_queue']
 
 
 # 使用简化的模型定义
@@ -37,7 +66,7 @@ class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
     password = db.Column(db.String(120), nullable=False)
-    role = db.Column(db.String(10), nullable=False)
+    role = db.Column(db.String(10), nullable=False, index=True)
     name = db.Column(db.String(100), nullable=False)
     email = db.Column(db.String(120), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -47,7 +76,7 @@ class Assignment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     content = db.Column(db.Text, nullable=False)
-    teacher_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    teacher_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     due_date = db.Column(db.DateTime)
 
@@ -55,49 +84,322 @@ class Assignment(db.Model):
 
 
 class Submission(db.Model):
+    __table_args__ = (
+        # 每个学生每个作业只能有一份提交；该索引同时服务于按作业查询提交
+        db.Index('uq_submission_assignment_student', 'assignment_id', 'student_id', unique=True),
+        db.Index('ix_submission_student_id', 'student_id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     assignment_id = db.Column(db.Integer, db.ForeignKey('assignment.id'), nullable=False)
     student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     content = db.Column(db.Text, nullable=True)
     file_path = db.Column(db.String(500), nullable=True)
     file_name = db.Column(db.String(255), nullable=True)
+    # 上传文件内容的SHA-256，相同内容的文件共用一份存储和文本提取结果
+    file_hash = db.Column(db.String(64), nullable=True, index=True)
     submitted_at = db.Column(db.DateTime, default=datetime.utcnow)
     grade = db.Column(db.String(10), nullable=True)
+    # 上传时提取的Word文档文本，预览和评分直接使用，不再重复解析文件；列表查询时不加载
+    extracted_text = deferred(db.Column(db.Text, nullable=True))
 
     assignment = db.relationship('Assignment', backref=db.backref('submissions', lazy=True))
     student = db.relationship('User', backref=db.backref('submissions', lazy=True))
 
-# 创建数据库表
-with app.app_context():
-    # 仅测试用
-    #db.drop_all()
 
+class GradingJob(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    submission_id = db.Column(db.Integer, db.ForeignKey('submission.id'), unique=True, nullable=False)
+    status = db.Column(db.String(10), nullable=False, default='pending', index=True)
+    result = db.Column(db.Text, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    submission = db.relationship('Submission', backref=db.backref('grading_job', uselist=False, lazy=True))
+
+class GradingResult(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    submission_id = db.Column(db.Integer, db.ForeignKey('submission.id'), unique=True, nullable=False)
+    total_score = db.Column(db.Float, nullable=True)
+    correctness = db.Column(db.Float, nullable=True)  # 正确性（50分）
+    knowledge = db.Column(db.Float, nullable=True)  # 知识点使用（35分）
+    readability = db.Column(db.Float, nullable=True)  # 可读性（10分）
+    robustness = db.Column(db.Float, nullable=True)  # 健壮性（5分）
+    question_count = db.Column(db.Integer, nullable=True)
+    input_tokens = db.Column(db.Integer, nullable=True)  # 作业内容压缩前的token数
+    prompt_tokens = db.Column(db.Integer, nullable=True)  # 压缩后实际发送的token数
+    model_name = db.Column(db.String(100), nullable=True)
+    graded_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    submission = db.relationship('Submission', backref=db.backref('grading_result', uselist=False, lazy=True))
+
+def init_db():
+    """创建数据库表并升级已有数据库的表结构，需要在app_context中调用"""
     db.create_all()
+    upgrade_schema(db)
+
+
+def seed_users():
+    """添加初始测试用户（在实际使用中不要执行）"""
+    demo_users = [
+        ('t1', 'teacher', '张老师'),
+        ('s1', 'student', '李同学'),
+        ('s2', 'student', '王同学'),
+    ]
+    for username, role, name in demo_users:
+        if not User.query.filter_by(username=username).first():
+            db.session.add(User(username=username, password='123', role=role, name=name))
+    db.session.commit()
 
-    # 添加初始测试用户（在实际使用中应该删除这部分）
-    if not User.query.filter_by(username='t1').first():
-        teacher = User(username='t1', password='123', role='teacher', name='张老师')
-        db.session.add(teacher)
 
-    if not User.query.filter_by(username='s1').first():
-        student = User(username='s1', password='123', role='student', name='李同学')
-        db.session.add(student)
+@click.command('init-db')
+@with_appcontext
+def init_db_command():
+    """创建数据库表并升级表结构"""
+    init_db()
+    print("✅ 数据库已初始化")
 
-    if not User.query.filter_by(username='s2').first():
-        student2 = User(username='s2', password='123', role='student', name='王同学')
-        db.session.add(student2)
 
-    db.session.commit()
+@click.command('seed-users')
+@with_appcontext
+def seed_users_command():
+    """添加测试账号t1、s1、s2（密码123）"""
+    init_db()
+    seed_users()
+    print("✅ 测试账号已添加")
 
 
-@app.route('/', methods=['GET', 'POST'])
-@app.route('/login', methods=['GET', 'POST'])
+@click.command('dedupe-submissions')
+@click.option('--archive', 'archive', is_flag=True, help='备份到CSV后删除重复提交（默认只列出）')
+@click.option('--archive-path', default=None, help='备份文件路径，默认 duplicate_submissions_<时间>.csv')
+@with_appcontext
+def dedupe_submissions_command(archive, archive_path):
+    """检查同一学生对同一作业的重复提交（每组保留最早的一条）"""
+    db.create_all()
+    duplicates = find_duplicate_submissions(db)
+    if not duplicates:
+        print("✅ 没有重复提交")
+        return
+    for row in duplicates:
+        print(f"  作业{row['assignment_id']} 学生{row['student_id']} 提交{row['id']} "
+              f"{row['submitted_at']} {row['file_name'] or ''} {row['grade'] or ''}")
+    if not archive:
+        print(f"⚠️ 共 {len(duplicates)} 条重复提交，确认后加 --archive 备份并删除")
+        return
+    archive_path = archive_path or default_archive_path()
+    archive_duplicate_submissions(db, duplicates, archive_path)
+    print(f"✅ 已删除 {len(duplicates)} 条重复提交，备份保存在 {archive_path}（上传的文件未删除）")
+
+
+def get_submission_text(submission):
+    """
+    获取提交的Word文档文本：优先使用上传时保存的提取结果，
+    历史提交没有保存时提取一次并写回数据库
+    """
+    if submission.extracted_text is None:
+        submission.extracted_text = extract_docx_text(submission.file_path)
+        db.session.commit()
+    return submission.extracted_text
+
+
+def get_extracted_text_by_hash(file_hash):
+    """相同内容的文件已提取过文本时直接复用"""
+    return db.session.query(Submission.extracted_text).filter(
+        Submission.file_hash == file_hash,
+        Submission.extracted_text.isnot(None)
+    ).limit(1).scalar()
+
+
+def submission_file_name(submission):
+    """
+    提交文件下载和打包时使用的文件名
+
+    上传时的文件名经过secure_filename处理，中文会被去掉（例如"作业.docx"变成"docx"），
+    去掉后没有文件名或扩展名与存储的文件不一致时使用submission_<id><扩展名>
+    """
+    extension = os.path.splitext(submission.file_path or '')[1]
+    stem, name_extension = os.path.splitext(submission.file_name or '')
+    if not stem or name_extension.lower() != extension.lower():
+        return f"submission_{submission.id}{extension}"
+    return submission.file_name
+
+
+def delete_unreferenced_file(file_path):
+    """删除不再被任何提交引用的上传文件（正在上传、尚未提交的相同文件不会被删除）"""
+    get_upload_storage().delete_unreferenced(
+        file_path, lambda path: Submission.query.filter_by(file_path=path).first() is not None)
+
+
+def save_grading_result(submission, grader_result, compaction=None, model_name=None):
+    """
+    解析评分输出，保存各维度分数并把总分写入Submission.grade
+
+    不提交事务：由评分队列在确认任务没有过期（评分期间提交未被更新）后与任务状态一起提交
+
+    Args:
+        submission: 提交记录
+        grader_result: 评分结果字符串
+        compaction: 作业内容的压缩报告，用于记录token数
+        model_name: 评分使用的模型，默认为Config.MODEL_NAME
+    """
+    scores = parse_grader_output(grader_result)
+    if scores is None:
+        print(f"⚠️ 提交 {submission.id} 的评分结果无法解析出分数")
+        return None
+
+    result = GradingResult.query.filter_by(submission_id=submission.id).first()
+    if result is None:
+        result = GradingResult(submission_id=submission.id)
+        db.session.add(result)
+    result.total_score = scores['total']
+    result.correctness = scores['correctness']
+    result.knowledge = scores['knowledge']
+    result.readability = scores['readability']
+    result.robustness = scores['robustness']
+    result.question_count = scores['question_count']
+    if compaction is not None:
+        result.input_tokens = compaction.tokens_before
+        result.prompt_tokens = compaction.tokens_after
+    result.model_name = model_name or getattr(Config, 'MODEL_NAME', None)
+    result.graded_at = datetime.utcnow()
+    submission.grade = format_grade(scores['total'])
+    return result
+
+
+def grade_submission(submission_id):
+    """
+    评分队列的评分函数：读取提交的Word文档，先做本地静态分析，再调用大模型评分
+
+    Returns:
+        (评分结果字符串, 保存分数的函数)，分数由评分队列在确认任务没有过期后保存；
+        无法评分时只返回以"❌"开头的错误信息
+    """
+    submission = db.session.get(Submission, submission_id)
+    if submission is None:
+        return "❌ 评分失败：提交不存在"
+    if not submission.file_path or not submission.file_path.endswith('.docx'):
+        return "❌ 评分失败：没有可评分的Word文档"
+    if submission.extracted_text is None and not os.path.exists(submission.file_path):
+        return "❌ 评分失败：Word文档不存在"
+
+    text = get_submission_text(submission)
+    homework_id = Promptconfig.match_homework_id(submission.assignment.title)
+    # 本地静态分析：检查语法、知识点和代码规范，不需要大模型
+    analysis = analyze_submission(text, homework_id)
+    if not Config.IS_LLM_RUN or (Config.PRECHECK_SKIP_LLM and analysis.all_failed):
+        grader_result = analysis.local_grade()
+        print(f"🔍 提交 {submission_id} 使用本地静态分析评分--->\n", grader_result)
+        return grader_result, lambda: save_grading_result(
+            db.session.get(Submission, submission_id), grader_result, model_name=Config.LOCAL_MODEL_NAME)
+
+    # 评分器发送前把每个提示词的作业内容压缩到token预算以内（按题目评分时每道题分别压缩），
+    # 这里记录实际发送内容压缩前后的token数
+    compactions = []
+    # 大模型客户端（requests等）只在真正评分时才导入
+    from homework_LLM_grader import PythonCodeGrader
+    grader = PythonCodeGrader()
+    # 流式评分：生成的文本实时发布给预览页的SSE订阅者
+    stream = grading_streams.open(submission_id)
+    grader_result = None
+    try:
+        on_delta = stream.publish if Config.LLM_STREAMING else None
+        # 按题目评分：作业标题能匹配到知识点配置时，逐题并发评分
+        if Config.PER_QUESTION_GRADING and homework_id:
+            question_facts = analysis.question_facts() if Config.STATIC_ANALYSIS_FACTS else None
+            grader_result = grader.evaluate_by_question(text, homework_id, on_delta=on_delta,
+                                                        question_facts=question_facts,
+                                                        on_compaction=compactions.append)
+        else:
+            facts = analysis.facts() if Config.STATIC_ANALYSIS_FACTS else None
+            grader_result = grader.evaluate_code_2(text, on_delta=on_delta, facts=facts,
+                                                   on_compaction=compactions.append,
+                                                   on_reset=stream.reset)
+    finally:
+        grading_streams.close(submission_id, stream, grader_result)
+    compaction = CompactionReport.combine(compactions) if compactions else None
+    print(f"📏 提交 {submission_id} 的作业内容：{compaction}")
+    print(f"📊作业评估结果，来自大模型{Config.MODEL_NAME}--->\n", grader_result)
+
+    # 评分完成后在后台预先合成语音，预览页直接播放
+    if Config.IS_SOUND_ON and not grader_result.startswith("❌"):
+        speech_cache.render_async(grader_result)
+    return grader_result, lambda: save_grading_result(
+        db.session.get(Submission, submission_id), grader_result, compaction)
+
+
+_db_init_lock = threading.Lock()
+
+
+@bp.before_app_request
+def ensure_database():
+    """第一个请求到来时创建/升级数据库表，导入和启动时不访问数据库"""
+    if not Config.AUTO_INIT_DB or current_app.extensions.get('db_initialized'):
+        return
+    with _db_init_lock:
+        if not current_app.extensions.get('db_initialized'):
+            init_db()
+            current_app.extensions['db_initialized'] = True
+
+
+@bp.before_app_request
+def validate_llm_config():
+    """第一个请求到来时检查大模型配置，导入和创建应用时不检查（缺少API KEY时也能执行flask命令）"""
+    if not Config.IS_LLM_RUN or current_app.extensions.get('llm_config_validated'):
+        return
+    Config.validate_config()
+    current_app.extensions['llm_config_validated'] = True
+
+
+@bp.before_app_request
+def start_grading_queue():
+    if Config.grading_enabled():
+        get_grading_queue().ensure_started()
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_start'].pop()
+    # 只统计请求处理中的查询，后台评分线程的查询不计入
+    if has_request_context() and 'sql_queries' in g:
+        g.sql_queries += 1
+        g.sql_seconds += elapsed
+
+
+@bp.before_app_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    g.sql_queries = 0
+    g.sql_seconds = 0.0
+
+
+@bp.after_app_request
+def record_request_metrics(response):
+    """按路由记录请求耗时、SQL查询数和查询耗时"""
+    if 'request_start' in g:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.observe('http_request_duration_seconds', time.perf_counter() - g.request_start,
+                        route=route, method=request.method, status=response.status_code)
+        metrics.observe('http_request_sql_queries', g.sql_queries, buckets=COUNT_BUCKETS, route=route)
+        metrics.observe('http_request_sql_seconds', g.sql_seconds, route=route)
+    return response
+
+
+@bp.route('/', methods=['GET', 'POST'])
+@bp.route('/login', methods=['GET', 'POST'])
 def login():
     # 如果已登录，直接重定向到对应面板
     if 'user_id' in session and session['role'] == 'teacher':
-        return redirect(url_for('teacher_dashboard'))
+        return redirect(url_for('main.teacher_dashboard'))
     elif 'user_id' in session and session['role'] == 'student':
-        return redirect(url_for('student_dashboard'))
+        return redirect(url_for('main.student_dashboard'))
 
     if request.method == 'POST':
         username = request.form['username']
@@ -112,33 +414,35 @@ def login():
             session['name'] = user.name
 
             if user.role == 'teacher':
-                return redirect(url_for('teacher_dashboard'))
+                return redirect(url_for('main.teacher_dashboard'))
             else:
-                return redirect(url_for('student_dashboard'))
+                return redirect(url_for('main.student_dashboard'))
         else:
             return render_template('login.html', error='用户名或密码错误')
 
     return render_template('login.html')
 
-@app.route('/logout')
+@bp.route('/logout')
 def logout():
     session.clear()
-    return redirect(url_for('login'))
+    return redirect(url_for('main.login'))
 
 
-@app.route('/teacher/dashboard')
+@bp.route('/teacher/dashboard')
 def teacher_dashboard():
     if 'user_id' not in session or session['role'] != 'teacher':
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
 
-    assignments = Assignment.query.filter_by(teacher_id=session['user_id']).all()
-    return render_template('teacher_dashboard.html', assignments=assignments)
+    after, before, page_size = get_page_args()
+    page = keyset_paginate(Assignment.query.filter_by(teacher_id=session['user_id']),
+                           Assignment.id, after, before, page_size)
+    return render_template('teacher_dashboard.html', assignments=page.items, page=page)
 
 
-@app.route('/teacher/create_assignment', methods=['GET', 'POST'])
+@bp.route('/teacher/create_assignment', methods=['GET', 'POST'])
 def create_assignment():
     if 'user_id' not in session or session['role'] != 'teacher':
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
 
     if request.method == 'POST':
         title = request.form['title']
@@ -158,49 +462,186 @@ def create_assignment():
         db.session.add(new_assignment)
         db.session.commit()
 
-        return redirect(url_for('teacher_dashboard'))
+        return redirect(url_for('main.teacher_dashboard'))
 
     return render_template('create_assignment.html')
 
 
-@app.route('/teacher/view_submissions/<int:assignment_id>')
+@bp.route('/teacher/view_submissions/<int:assignment_id>')
 def view_submissions(assignment_id):
     if 'user_id' not in session or session['role'] != 'teacher':
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
 
     assignment = Assignment.query.get_or_404(assignment_id)
 
     # 确保老师只能查看自己发布的作业
     if assignment.teacher_id != session['user_id']:
-        return redirect(url_for('teacher_dashboard'))
+        return redirect(url_for('main.teacher_dashboard'))
+
+    # 连同学生信息一起查询，避免模板中逐行加载submission.student；按id游标分页
+    after, before, page_size = get_page_args()
+    page = keyset_paginate(
+        Submission.query.options(joinedload(Submission.student)).filter_by(assignment_id=assignment_id),
+        Submission.id, after, before, page_size)
+    total = Submission.query.filter_by(assignment_id=assignment_id).count()
+
+    # 成绩统计直接由数据库聚合已保存的分数
+    stats = db.session.query(
+        func.count(GradingResult.id).label('graded'),
+        func.avg(GradingResult.total_score).label('total_score'),
+        func.max(GradingResult.total_score).label('max_score'),
+        func.min(GradingResult.total_score).label('min_score'),
+        func.avg(GradingResult.correctness).label('correctness'),
+        func.avg(GradingResult.knowledge).label('knowledge'),
+        func.avg(GradingResult.readability).label('readability'),
+        func.avg(GradingResult.robustness).label('robustness'),
+    ).join(Submission).filter(Submission.assignment_id == assignment_id).one()
+
+    return render_template('view_submissions.html', assignment=assignment,
+                           submissions=page.items, page=page, total=total, stats=stats)
+
+
+@bp.route('/teacher/download_all/<int:assignment_id>')
+def download_all_submissions(assignment_id):
+    """把作业的所有提交文件和成绩清单（manifest.csv）打包成ZIP，边生成边发送"""
+    if 'user_id' not in session or session['role'] != 'teacher':
+        return redirect(url_for('main.login'))
+
+    assignment = Assignment.query.get_or_404(assignment_id)
+    if assignment.teacher_id != session['user_id']:
+        return redirect(url_for('main.teacher_dashboard'))
+
+    def entries():
+        manifest = [['学号', '姓名', '提交时间', '成绩', '文件']]
+        # 分批读取提交，不一次性加载整个班级
+        submissions = Submission.query.options(joinedload(Submission.student)) \
+            .filter_by(assignment_id=assignment_id).order_by(Submission.id).yield_per(50)
+        for submission in submissions:
+            student = submission.student
+            arcname = ''
+            if submission.file_path and os.path.exists(submission.file_path):
+                file_name = submission_file_name(submission)
+                # 姓名由学生注册时填写，去掉路径分隔符和".."，防止解压时写到文件夹之外
+                folder = '_'.join(part for part in (secure_filename(student.username),
+                                                    safe_archive_name(student.name)) if part)
+                arcname = f"{folder or student.id}/{file_name}"
+                yield arcname, submission.file_path
+            manifest.append([student.username, student.name,
+                             submission.submitted_at.strftime('%Y-%m-%d %H:%M'),
+                             submission.grade or '', arcname or '（无文件）'])
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows([csv_cell(value) for value in row] for row in manifest)
+        # 带BOM，Excel打开时中文不乱码
+        yield 'manifest.csv', buffer.getvalue().encode('utf-8-sig')
+
+    download_name = f"{assignment.title}_提交.zip"
+    response = Response(stream_with_context(stream_zip(entries())), mimetype='application/zip')
+    response.headers['Content-Disposition'] = \
+        f"attachment; filename=\"assignment_{assignment_id}.zip\"; filename*=UTF-8''{quote(download_name)}"
+    return response
+
+
+@bp.route('/teacher/export_grades')
+def export_grades():
+    """
+    导出成绩（CSV或XLSX），边查询边输出
+
+    参数：format=csv|xlsx；assignment_id指定作业，不指定时导出该老师所有作业的成绩
+    """
+    if 'user_id' not in session or session['role'] != 'teacher':
+        return redirect(url_for('main.login'))
+
+    export_format = request.args.get('format', 'csv')
+    if export_format not in ('csv', 'xlsx'):
+        abort(400)
+    assignment_id = request.args.get('assignment_id', type=int)
+
+    query = db.session.query(
+        Assignment.title, Assignment.due_date, User.username, User.name,
+        Submission.submitted_at, Submission.grade,
+        GradingResult.total_score, GradingResult.correctness, GradingResult.knowledge,
+        GradingResult.readability, GradingResult.robustness,
+    ).select_from(Submission) \
+        .join(Assignment, Submission.assignment_id == Assignment.id) \
+        .join(User, Submission.student_id == User.id) \
+        .outerjoin(GradingResult, GradingResult.submission_id == Submission.id) \
+        .filter(Assignment.teacher_id == session['user_id'])
+    if assignment_id is not None:
+        assignment = Assignment.query.get_or_404(assignment_id)
+        if assignment.teacher_id != session['user_id']:
+            return redirect(url_for('main.teacher_dashboard'))
+        query = query.filter(Submission.assignment_id == assignment_id)
+        file_stem = f"assignment_{assignment_id}_grades"
+    else:
+        file_stem = "grades"
+    # yield_per分批读取（PostgreSQL上使用服务端游标），不把整个结果集放在内存里
+    rows = (grade_row(row) for row in query.order_by(Assignment.id, Submission.id).yield_per(500))
+
+    if export_format == 'xlsx':
+        body = stream_xlsx(rows)
+        mimetype = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    else:
+        body = stream_csv(rows)
+        mimetype = 'text/csv'
+    response = Response(stream_with_context(body), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="{file_stem}.{export_format}"'
+    return response
+
+
+@bp.route('/teacher/grade_all/<int:assignment_id>', methods=['POST'])
+def grade_all(assignment_id):
+    """将作业下所有尚未评分的Word文档提交加入后台评分队列，由工作线程池并发评分"""
+    if 'user_id' not in session or session['role'] != 'teacher':
+        return redirect(url_for('main.login'))
+
+    assignment = Assignment.query.get_or_404(assignment_id)
+    if assignment.teacher_id != session['user_id']:
+        return redirect(url_for('main.teacher_dashboard'))
 
-    # 使用正确的关系访问
-    submissions = Submission.query.filter_by(assignment_id=assignment_id).all()
+    if not Config.grading_enabled():
+        flash('未启用自动评分', 'error')
+        return redirect(url_for('main.view_submissions', assignment_id=assignment_id))
+
+    # 已评分完成或正在评分的提交不再重复加入
+    graded_ids = db.session.query(GradingJob.submission_id).join(Submission).filter(
+        Submission.assignment_id == assignment_id,
+        GradingJob.status.in_([GradingQueue.DONE, GradingQueue.RUNNING, GradingQueue.PENDING])
+    )
+    submission_ids = [submission_id for (submission_id,) in db.session.query(Submission.id).filter(
+        Submission.assignment_id == assignment_id,
+        Submission.file_path.like('%.docx'),
+        Submission.id.notin_(graded_ids)
+    )]
 
-    return render_template('view_submissions.html', assignment=assignment, submissions=submissions)
+    get_grading_queue().enqueue_many(submission_ids)
+    flash(f'已将 {len(submission_ids)} 份提交加入评分队列', 'success')
+    return redirect(url_for('main.view_submissions', assignment_id=assignment_id))
 
 
-@app.route('/student/dashboard')
+@bp.route('/student/dashboard')
 def student_dashboard():
     # 检查会话
     if 'user_id' not in session:
         flash('请先登录', 'error')
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
 
     if session.get('role') != 'student':
         flash('无权限访问学生面板', 'error')
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
 
-    # 获取所有作业
-    assignments = Assignment.query.all()
-    assignments_with_status = []
+    # 一次查询取出所有作业及当前学生的提交（外连接，未提交的作业submission为None）
+    rows = db.session.query(Assignment, Submission).outerjoin(
+        Submission,
+        and_(Submission.assignment_id == Assignment.id,
+             Submission.student_id == session['user_id'])
+    ).order_by(Assignment.id).all()
 
-    for assignment in assignments:
-        # 检查学生是否已提交该作业
-        submission = Submission.query.filter_by(
-            assignment_id=assignment.id,
-            student_id=session['user_id']
-        ).first()
+    assignments_with_status = []
+    seen_assignment_ids = set()
+    for assignment, submission in rows:
+        if assignment.id in seen_assignment_ids:
+            continue
+        seen_assignment_ids.add(assignment.id)
 
         assignments_with_status.append({
             'assignment': assignment,
@@ -209,17 +650,17 @@ def student_dashboard():
         })
 
     # 添加调试信息
-    print(f"找到 {len(assignments)} 个作业")
+    print(f"找到 {len(assignments_with_status)} 个作业")
     print(
         f"学生 {session['user_id']} 的作业状态: {[(item['assignment'].title, item['submitted']) for item in assignments_with_status]}")
 
     return render_template('student_dashboard.html', assignments=assignments_with_status)
 
 
-@app.route('/student/submit_assignment/<int:assignment_id>', methods=['GET', 'POST'])
+@bp.route('/student/submit_assignment/<int:assignment_id>', methods=['GET', 'POST'])
 def submit_assignment(assignment_id):
     if 'user_id' not in session or session['role'] != 'student':
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
 
     assignment = Assignment.query.get_or_404(assignment_id)
 
@@ -236,17 +677,25 @@ def submit_assignment(assignment_id):
         # 处理文件上传
         file_path = None
         file_name = None
+        file_hash = None
+        extracted_text = None
 
         if file and file.filename:
             if allowed_file(file.filename):
                 # 生成安全的文件名
                 filename = secure_filename(file.filename)
-                # 添加时间戳避免重名
-                timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S_')
-                unique_filename = f"{timestamp}{filename}"
-                file_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-                file.save(file_path)
+                # 边接收边计算哈希，按内容存储，相同内容的文件不重复保存
+                extension = os.path.splitext(file.filename)[1]
+                file_hash, file_path = get_upload_storage().save(file.stream, extension)
                 file_name = filename
+                # 上传时一次性提取Word文档文本，之后的预览和评分不再解析文件
+                if file_path.endswith('.docx'):
+                    extracted_text = get_extracted_text_by_hash(file_hash)
+                    if extracted_text is None:
+                        try:
+                            extracted_text = extract_docx_text(file_path)
+                        except Exception as e:
+                            print(f"❌ 文档文本提取失败：{e}")
                 flash('文件上传成功!', 'success')
             else:
                 flash('不支持的文件类型。请上传 txt, pdf, doc 或 docx 文件。', 'error')
@@ -259,12 +708,15 @@ def submit_assignment(assignment_id):
                 # 更新现有提交
                 existing_submission.content = content
                 if file_path:
-                    # 如果之前有文件，删除旧文件
-                    if existing_submission.file_path and os.path.exists(existing_submission.file_path):
-                        os.remove(existing_submission.file_path)
+                    old_file_path = existing_submission.file_path
                     existing_submission.file_path = file_path
                     existing_submission.file_name = file_name
+                    existing_submission.file_hash = file_hash
+                    existing_submission.extracted_text = extracted_text
                 existing_submission.submitted_at = datetime.utcnow()
+                # 重新提交后旧的成绩作废，等待重新评分，评分失败时不会保留上一次的成绩
+                existing_submission.grade = None
+                GradingResult.query.filter_by(submission_id=existing_submission.id).delete()
                 message = '作业提交已更新!'
             else:
                 # 创建新提交
@@ -273,14 +725,38 @@ def submit_assignment(assignment_id):
                     student_id=session['user_id'],
                     content=content,
                     file_path=file_path,
-                    file_name=file_name
+                    file_name=file_name,
+                    file_hash=file_hash,
+                    extracted_text=extracted_text
                 )
                 db.session.add(new_submission)
                 message = '作业提交成功!'
 
-            db.session.commit()
+            try:
+                db.session.commit()
+            finally:
+                # 提交成功后文件已被引用，失败时由下面的分支清理
+                get_upload_storage().release(file_path)
+
+            # 如果之前有文件且已没有其他提交引用，删除旧文件
+            if existing_submission and file_path and old_file_path != file_path:
+                delete_unreferenced_file(old_file_path)
+
+            # 上传了Word文档则加入后台评分队列
+            submission = existing_submission or new_submission
+            if Config.grading_enabled() and submission.file_path and submission.file_path.endswith('.docx'):
+                get_grading_queue().enqueue(submission.id)
+
             flash(message, 'success')
-            return redirect(url_for('student_dashboard'))
+            return redirect(url_for('main.student_dashboard'))
+
+        except IntegrityError:
+            # 并发重复提交（例如双击提交按钮）被唯一索引拦截
+            db.session.rollback()
+            # 本次保存的文件没有被任何提交引用时删除
+            delete_unreferenced_file(file_path)
+            flash('作业已提交，请勿重复提交', 'error')
+            return redirect(url_for('main.student_dashboard'))
 
         except Exception as e:
             db.session.rollback()
@@ -292,14 +768,14 @@ def submit_assignment(assignment_id):
 
 
 # 注册路由
-@app.route('/register', methods=['GET', 'POST'])
+@bp.route('/register', methods=['GET', 'POST'])
 def register():
     # 如果是老师登录，重定向到教师面板
     if 'user_id' in session and session['role'] == 'teacher':
-        return redirect(url_for('teacher_dashboard'))
+        return redirect(url_for('main.teacher_dashboard'))
     # 如果是学生登录，重定向到学生面板
     elif 'user_id' in session and session['role'] == 'student':
-        return redirect(url_for('student_dashboard'))
+        return redirect(url_for('main.student_dashboard'))
 
     if request.method == 'POST':
         username = request.form['username']
@@ -334,7 +810,7 @@ def register():
             db.session.add(new_student)
             db.session.commit()
             flash('注册成功！请登录', 'success')
-            return redirect(url_for('login'))
+            return redirect(url_for('main.login'))
         except Exception as e:
             db.session.rollback()
             flash('注册失败，请稍后重试', 'error')
@@ -343,85 +819,161 @@ def register():
     return render_template('register.html')
 
 
-@app.route('/teacher/student_management')
+@bp.route('/teacher/student_management')
 def student_management():
     if 'user_id' not in session or session['role'] != 'teacher':
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
+
+    # 获取学生及各自的提交数量（一次分组查询，避免逐个加载student.submissions）；按id游标分页
+    after, before, page_size = get_page_args()
+    query = db.session.query(User, func.count(Submission.id)).outerjoin(
+        Submission, Submission.student_id == User.id
+    ).filter(User.role == 'student').group_by(User.id)
+    page = keyset_paginate(query, User.id, after, before, page_size,
+                           key_func=lambda row: row[0].id)
+    total = User.query.filter_by(role='student').count()
+    return render_template('student_management.html', students=page.items, page=page, total=total)
+
+
+@bp.route('/teacher/import_students', methods=['GET', 'POST'])
+def import_students_view():
+    """从CSV/XLSX批量导入学生账号"""
+    if 'user_id' not in session or session['role'] != 'teacher':
+        return redirect(url_for('main.login'))
+
+    errors = []
+    if request.method == 'POST':
+        file = request.files.get('file')
+        if not file or not file.filename:
+            flash('请选择要导入的文件', 'error')
+        else:
+            try:
+                records, errors = parse_students(read_table(file.read(), file.filename))
+                imported, conflicts = import_students(db, User, records)
+                errors = sorted(errors + conflicts)
+                flash(f'已导入 {imported} 名学生', 'success')
+            except ValueError as e:
+                flash(str(e), 'error')
+            except IntegrityError:
+                # 导入期间有同名账号被注册，整批回滚
+                db.session.rollback()
+                flash('导入失败：有用户名在导入过程中被注册，请重新导入', 'error')
+
+    return render_template('import_students.html', errors=errors,
+                           default_password=Config.IMPORT_DEFAULT_PASSWORD)
+
+
+@bp.route('/teacher/grading_cache_stats')
+def grading_cache_stats():
+    """评分缓存命中统计，供监控使用"""
+    if 'user_id' not in session or session['role'] != 'teacher':
+        return redirect(url_for('main.login'))
+
+    return jsonify(grading_cache.stats())
+
+
+@bp.route('/teacher/llm_rate_limit_stats')
+def llm_rate_limit_stats():
+    """大模型接口限流与重试计数，供监控使用"""
+    if 'user_id' not in session or session['role'] != 'teacher':
+        return redirect(url_for('main.login'))
+
+    return jsonify(rate_limiter.stats.snapshot())
 
-    # 获取所有学生，包括他们的提交信息
-    students = User.query.filter_by(role='student').all()
-    return render_template('student_management.html', students=students)
 
+@bp.route('/metrics')
+def metrics_endpoint():
+    """Prometheus格式的性能指标，仅允许老师或携带Config.METRICS_TOKEN的请求访问"""
+    is_teacher = 'user_id' in session and session['role'] == 'teacher'
+    # 经过反向代理时所有请求都来自本机，不能按来源地址放行
+    token = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+    has_token = bool(Config.METRICS_TOKEN) and hmac.compare_digest(token.encode(), Config.METRICS_TOKEN.encode())
+    if not is_teacher and not has_token:
+        abort(403)
 
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
-@app.route('/download/<int:submission_id>')
+
+@bp.route('/download/<int:submission_id>')
 def download_file(submission_id):
     if 'user_id' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
 
     submission = Submission.query.get_or_404(submission_id)
 
     # 权限检查：老师可以下载任何提交，学生只能下载自己的提交
     if session['role'] == 'student' and submission.student_id != session['user_id']:
         flash('没有权限访问此文件', 'error')
-        return redirect(url_for('student_dashboard'))
+        return redirect(url_for('main.student_dashboard'))
 
     if not submission.file_path or not os.path.exists(submission.file_path):
         flash('文件不存在', 'error')
-        return redirect(request.referrer or url_for('student_dashboard'))
+        return redirect(request.referrer or url_for('main.student_dashboard'))
 
-    # 发送文件
-    return send_file(
+    # 发送文件：支持条件请求和断点续传，按内容存储的文件用内容哈希作为ETag
+    return send_stored_file(
         submission.file_path,
-        as_attachment=True,
-        download_name=submission.file_name or f"submission_{submission_id}.docx"
+        download_name=submission_file_name(submission),
+        etag=submission.file_hash
     )
 
 
 # 添加预览Word文档内容的功能
-@app.route('/preview/<int:submission_id>')
+@bp.route('/preview/<int:submission_id>')
 def preview_file(submission_id):
     if 'user_id' not in session:
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
 
     submission = Submission.query.get_or_404(submission_id)
 
     # 权限检查
     if session['role'] == 'student' and submission.student_id != session['user_id']:
         flash('没有权限访问此文件', 'error')
-        return redirect(url_for('student_dashboard'))
+        return redirect(url_for('main.student_dashboard'))
 
-    if not submission.file_path or not os.path.exists(submission.file_path):
+    # 已保存提取文本的提交不需要访问文件
+    if not submission.file_path or \
+            (submission.extracted_text is None and not os.path.exists(submission.file_path)):
         flash('文件不存在', 'error')
-        return redirect(request.referrer or url_for('student_dashboard'))
+        return redirect(request.referrer or url_for('main.student_dashboard'))
 
     # 尝试读取Word文档内容
     try:
         if submission.file_path.endswith('.docx'):
-            doc = Document(submission.file_path)
-            content = ""
-            for paragraph in doc.paragraphs:
-                content += paragraph.text + "\n"
-
-            if Config.IS_LLM_RUN:
-                try:
-                    # 创建判分器实例
-                    grader = PythonCodeGrader()
-                    grader_result = grader.evaluate_code_2(content)
-                    print(f"📊作业评估结果，来自大模型{Config.MODEL_NAME}--->\n",grader_result)
-                except ValueError as e:
-                    print(f"❌ 初始化错误：{e}")
-                except Exception as e:
-                    print(f"❌ 运行错误：{e}")
-
-            if Config.IS_SOUND_ON:
-                assistant = VoiceAssistant()
-                assistant.speak(grader_result)
+            content = get_submission_text(submission)
+
+            # 评分由后台队列完成，这里只读取已保存的结果
+            grading_status = None
+            grader_result = "未启用自动评分"
+            if Config.grading_enabled():
+                job = get_grading_queue().get_job(submission.id)
+                if job is None:
+                    # 队列上线前的历史提交，补充加入评分队列
+                    job = get_grading_queue().enqueue(submission.id)
+                grading_status = job.status
+                if job.status in (GradingQueue.DONE, GradingQueue.FAILED):
+                    grader_result = job.result
+                else:
+                    grader_result = "⏳ 评分中，请稍后刷新页面查看结果..."
+
+            # 语音在后台合成，未生成时补交合成任务，页面刷新后即可播放
+            audio_url = None
+            audio_pending = False
+            if Config.IS_SOUND_ON and grading_status == GradingQueue.DONE:
+                if speech_cache.get(grader_result):
+                    audio_url = url_for('main.grading_audio', submission_id=submission.id)
+                else:
+                    # 合成失败过的不再等待，页面不再自动刷新
+                    audio_pending = speech_cache.render_async(grader_result)
 
             return render_template('file_preview.html',
                                    submission=submission,
                                    file_content=content,
                                    grader_result=grader_result,
+                                   grading_status=grading_status,
+                                   audio_url=audio_url,
+                                   audio_pending=audio_pending,
+                                   sound_on=Config.IS_SOUND_ON,
                                    file_type='Word文档')
         else:
             # 对于其他文件类型，显示基本信息
@@ -437,6 +989,115 @@ def preview_file(submission_id):
                                content=f"文件读取错误: {str(e)}",
                                file_type='错误')
 
+
+@bp.route('/preview/<int:submission_id>/stream')
+def preview_stream(submission_id):
+    """以Server-Sent Events推送评分结果：评分进行中时逐段推送大模型输出，完成后推送完整结果"""
+    if 'user_id' not in session:
+        return redirect(url_for('main.login'))
+
+    submission = Submission.query.get_or_404(submission_id)
+    if session['role'] == 'student' and submission.student_id != session['user_id']:
+        abort(403)
+
+    def sse(event, data):
+        return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+    def generate():
+        # 每个连接只保持较短时间，结束后浏览器的EventSource自动重连，不长时间占用工作线程
+        deadline = time.time() + Config.SSE_MAX_SECONDS
+        yield f"retry: {Config.SSE_RETRY_MS}\n\n"
+        while time.time() < deadline:
+            # 评分在本进程中进行时，直接订阅评分流；每次连接都从头推送
+            stream = grading_streams.get(submission_id)
+            if stream is not None:
+                yield sse('reset', '')
+                for delta in stream.iter_deltas(deadline):
+                    yield sse('reset', '') if delta is None else sse('delta', delta)
+                # 评分失败时队列可能还会重试，以数据库中的任务状态为准
+                if stream.closed and stream.result and not stream.result.startswith("❌"):
+                    yield sse('done', stream.result)
+                    return
+                if not stream.closed:
+                    return
+
+            # 否则等待数据库中的评分任务完成
+            db.session.rollback()
+            job = get_grading_queue().get_job(submission_id)
+            if job is None or job.status in (GradingQueue.DONE, GradingQueue.FAILED):
+                yield sse('done', job.result if job else '')
+                return
+            yield ": keep-alive\n\n"
+            time.sleep(min(Config.GRADING_POLL_INTERVAL, max(0.0, deadline - time.time())))
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@bp.route('/preview/<int:submission_id>/audio')
+def grading_audio(submission_id):
+    """播放评分结果的语音（由后台预先合成）"""
+    if 'user_id' not in session:
+        return redirect(url_for('main.login'))
+
+    submission = Submission.query.get_or_404(submission_id)
+    if session['role'] == 'student' and submission.student_id != session['user_id']:
+        abort(403)
+
+    job = get_grading_queue().get_job(submission.id)
+    if job is None or job.status != GradingQueue.DONE:
+        abort(404)
+    audio_path = speech_cache.get(job.result)
+    if audio_path is None:
+        abort(404)
+
+    return send_file(os.path.abspath(audio_path), mimetype=f'audio/{Config.AUDIO_FORMAT}',
+                     conditional=True, max_age=Config.AUDIO_CACHE_MAX_AGE)
+
+def create_app(test_config=None):
+    """
+    创建并配置Flask应用
+
+    只做配置和注册，不连接数据库、不导入语音合成和大模型客户端，
+    数据库表在第一个请求时创建（或执行 flask --app app init-db），测试账号用 flask --app app seed-users 添加
+    """
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'your-secret-key-here'
+    app.config['SQLALCHEMY_DATABASE_URI'] = Config.SQLALCHEMY_DATABASE_URI
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+    # 文件上传配置
+    app.config['UPLOAD_FOLDER'] = 'uploads'
+    app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB 最大文件大小
+    app.config['ALLOWED_EXTENSIONS'] = {'txt', 'pdf', 'doc', 'docx'}
+
+    if test_config:
+        app.config.update(test_config)
+    app.config['SQLALCHEMY_DATABASE_URI'] = normalize_database_uri(app.config['SQLALCHEMY_DATABASE_URI'])
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
+
+    # 确保上传目录存在
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    # 上传文件按内容哈希存储，相同文件只保存一份
+    app.extensions['upload_storage'] = ContentAddressedStorage(app.config['UPLOAD_FOLDER'])
+
+    db.init_app(app)
+    with app.app_context():
+        configure_engine(db.engine)
+
+    # 后台评分队列，评分不再阻塞请求处理
+    app.extensions['grading_queue'] = GradingQueue(app, db, GradingJob, grade_submission)
+
+    app.register_blueprint(bp)
+
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(seed_users_command)
+    app.cli.add_command(dedupe_submissions_command)
+    return app
+
+
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    if Config.IS_LLM_RUN:
+        Config.validate_config()
+    create_app().run(debug=True, host='0.0.0.0', port=5000)
 
@@ -0,0 +1,154 @@
+# bench_grading.py
+"""
+评分吞吐量基准测试
+
+启动本地模拟大模型接口（mock_llm_server.py），分别以串行、批量、并发三种方式
+驱动PythonCodeGrader评分，输出每次评分延迟的p50/p95/p99和每分钟评分份数；
+stream模式串行使用流式接口，统计的是首个片段到达的延迟（TTFB）；
+local模式不调用接口，统计本地静态分析评分（static_analysis）的耗时。
+不访问任何远程接口，可在离线环境中对比每次性能改动的效果。
+
+用法：
+    python benchmarks/bench_grading.py --submissions 40 --latency 0.5 --concurrency 16
+    python benchmarks/bench_grading.py --url http://127.0.0.1:8765/v1/chat/completions
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('MY_LONGCAT_API_KEY', 'mock-key')
+os.environ.setdefault('MY_DEEPSEEK_API_KEY', 'mock-key')
+
+from mock_llm_server import add_option_arguments, options_from_args, start_mock_server  # noqa: E402
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(p / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def make_submissions(count, run_id):
+    # 每份内容都不同，避免命中评分缓存
+    return [{'content': f"##Begin\n题目1\nprint({run_id}, {i})\n运行结果\n{i}\n##End"}
+            for i in range(count)]
+
+
+def timed_grader(grader, latencies):
+    """包装evaluate_code_2，记录每次评分的耗时"""
+    evaluate = grader.evaluate_code_2
+    lock = threading.Lock()
+
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return evaluate(*args, **kwargs)
+        finally:
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    grader.evaluate_code_2 = wrapper
+    return grader
+
+
+def local_grade(content):
+    from static_analysis import analyze_submission
+    return analyze_submission(content, '作业2').local_grade()
+
+
+def run_mode(mode, count, concurrency):
+    from homework_LLM_grader import PythonCodeGrader
+
+    latencies = []
+    grader = timed_grader(PythonCodeGrader(), latencies)
+    submissions = make_submissions(count, f"{mode}-{time.time()}")
+
+    start = time.perf_counter()
+    if mode == 'local':
+        results = []
+        for s in submissions:
+            call_start = time.perf_counter()
+            results.append(local_grade(s['content']))
+            latencies.append(time.perf_counter() - call_start)
+    elif mode == 'single':
+        results = [grader.evaluate_code_2(s['content']) for s in submissions]
+    elif mode == 'stream':
+        results = []
+        for s in submissions:
+            first = []
+            call_start = time.perf_counter()
+
+            def on_delta(delta):
+                if not first:
+                    first.append(time.perf_counter() - call_start)
+
+            results.append(PythonCodeGrader.evaluate_code_2(grader, s['content'], on_delta=on_delta))
+            latencies.extend(first)
+    elif mode == 'batch':
+        results = [r['evaluation'] for r in grader.batch_evaluate(submissions).values()]
+    else:
+        results = [r['evaluation'] for _, r in grader.iter_batch_evaluate(submissions, concurrency)]
+    elapsed = time.perf_counter() - start
+
+    errors = sum(1 for r in results if r.startswith("❌"))
+    return {
+        'mode': mode,
+        'count': count,
+        'errors': errors,
+        'elapsed': elapsed,
+        'per_minute': count / elapsed * 60 if elapsed else 0.0,
+        'p50': percentile(latencies, 50),
+        'p95': percentile(latencies, 95),
+        'p99': percentile(latencies, 99),
+        'mean': statistics.mean(latencies) if latencies else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='评分吞吐量基准测试')
+    parser.add_argument('--submissions', type=int, default=20, help='每种模式评分的份数')
+    parser.add_argument('--modes', default='single,batch,concurrent,stream,local', help='要测试的模式')
+    parser.add_argument('--concurrency', type=int, default=16, help='concurrent模式的并发数')
+    parser.add_argument('--url', default=None, help='使用已启动的模拟接口，不在进程内启动')
+    parser.add_argument('--rpm', type=int, default=100000, help='限流器的每分钟请求数配额')
+    add_option_arguments(parser)
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if url is None:
+        server, url = start_mock_server(options=options_from_args(args))
+
+    from config import Config
+    Config.MY_LLM_API_URL = url
+    Config.MODEL_NAME = 'mock-grader'
+    Config.DEFAULT_RATE_LIMIT = {'rpm': args.rpm, 'tpm': args.rpm * 10000}
+    Config.TIMEOUT = min(Config.TIMEOUT, max(5, int(args.hang_seconds) - 1))
+    cache_dir = tempfile.mkdtemp()
+    Config.GRADING_CACHE_PATH = os.path.join(cache_dir, 'bench_cache.db')
+    import grading_cache
+    grading_cache.grading_cache.db_path = Config.GRADING_CACHE_PATH
+
+    print(f"🤖 模拟接口：{url}")
+    print(f"{'模式':<12}{'份数':>6}{'失败':>6}{'耗时(s)':>10}{'份/分钟':>10}"
+          f"{'p50(s)':>9}{'p95(s)':>9}{'p99(s)':>9}")
+    for mode in args.modes.split(','):
+        r = run_mode(mode.strip(), args.submissions, args.concurrency)
+        print(f"{r['mode']:<12}{r['count']:>6}{r['errors']:>6}{r['elapsed']:>10.2f}{r['per_minute']:>10.1f}"
+              f"{r['p50']:>9.2f}{r['p95']:>9.2f}{r['p99']:>9.2f}")
+
+    if server is not None:
+        print(f"📈 模拟接口统计：{server.stats.counters}")
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# bench_startup.py
+"""
+应用冷启动时间测试
+
+每轮在新的Python进程中导入app.py并执行create_app()，记录导入和创建应用的耗时、
+第一个请求的耗时（包含自动建表），并检查语音合成、Word解析、大模型客户端等
+较重的模块是否在启动时被导入。导入耗时的中位数超过--target时以非零状态退出，
+可以放在CI中防止启动时间回退。
+
+用法：
+    python benchmarks/bench_startup.py --runs 5 --target 1.0
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 启动时不应导入的模块（只在启用且第一次使用时才导入）
+LAZY_MODULES = ('pyttsx3', 'python_speaking', 'docx', 'requests', 'homework_LLM_grader')
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import app
+application = app.create_app()
+imported = time.perf_counter() - start
+loaded = [name for name in %r if name in sys.modules]
+start = time.perf_counter()
+application.test_client().get('/login')
+first_request = time.perf_counter() - start
+print(json.dumps({'import': imported, 'first_request': first_request, 'loaded': loaded}))
+"""
+
+
+def run_once(workdir):
+    env = dict(os.environ)
+    env.setdefault('MY_LONGCAT_API_KEY', 'startup-bench-key')
+    env.setdefault('MY_DEEPSEEK_API_KEY', 'startup-bench-key')
+    env['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'startup.db')}"
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [ROOT, env.get('PYTHONPATH')]))
+    if os.path.exists(os.path.join(workdir, 'startup.db')):
+        os.remove(os.path.join(workdir, 'startup.db'))
+    output = subprocess.run([sys.executable, '-c', PROBE % (LAZY_MODULES,)], cwd=workdir, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='应用冷启动时间测试')
+    parser.add_argument('--runs', type=int, default=5, help='测试轮数')
+    parser.add_argument('--target', type=float, default=1.0, help='导入耗时中位数的目标上限（秒）')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='homework_startup_')
+    try:
+        results = [run_once(workdir) for _ in range(args.runs)]
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    imports = [r['import'] for r in results]
+    first_requests = [r['first_request'] for r in results]
+    loaded = sorted({name for r in results for name in r['loaded']})
+    median = statistics.median(imports)
+    print(f"导入app.py并创建应用：中位数 {median * 1000:.0f}ms，最小 {min(imports) * 1000:.0f}ms，"
+          f"最大 {max(imports) * 1000:.0f}ms（{args.runs} 轮）")
+    print(f"第一个请求（含建表）：中位数 {statistics.median(first_requests) * 1000:.0f}ms")
+    print(f"启动时导入的重量级模块：{', '.join(loaded) if loaded else '无'}")
+
+    if median > args.target or loaded:
+        print(f"❌ 未达到启动目标（{args.target * 1000:.0f}ms 且不导入 {', '.join(LAZY_MODULES)}）")
+        sys.exit(1)
+    print(f"✅ 达到启动目标（{args.target * 1000:.0f}ms）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# bench_submission_indexes.py
+"""
+提交表索引的查询性能对比
+
+在临时SQLite数据库中生成10万条提交记录，分别在无索引（旧表结构）和
+添加索引（与app.py中模型定义一致）的情况下测量热点查询的耗时。
+
+用法：python benchmarks/bench_submission_indexes.py [提交数量]
+"""
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+SCHEMA = """
+CREATE TABLE user (id INTEGER PRIMARY KEY, username VARCHAR(80) UNIQUE NOT NULL,
+                   role VARCHAR(10) NOT NULL, name VARCHAR(100) NOT NULL);
+CREATE TABLE assignment (id INTEGER PRIMARY KEY, title VARCHAR(200) NOT NULL,
+                         teacher_id INTEGER NOT NULL);
+CREATE TABLE submission (id INTEGER PRIMARY KEY, assignment_id INTEGER NOT NULL,
+                         student_id INTEGER NOT NULL, file_name VARCHAR(255),
+                         grade VARCHAR(10));
+"""
+
+# 与app.py中User/Assignment/Submission模型定义的索引一致
+INDEXES = """
+CREATE INDEX ix_user_role ON user (role);
+CREATE INDEX ix_assignment_teacher_id ON assignment (teacher_id);
+CREATE UNIQUE INDEX uq_submission_assignment_student ON submission (assignment_id, student_id);
+CREATE INDEX ix_submission_student_id ON submission (student_id);
+"""
+
+QUERIES = {
+    '提交作业时查询已有提交': (
+        "SELECT * FROM submission WHERE assignment_id = ? AND student_id = ?",
+        lambda a, s, t: (a, s)),
+    '查看某作业的所有提交': (
+        "SELECT * FROM submission WHERE assignment_id = ?",
+        lambda a, s, t: (a,)),
+    '学生面板': (
+        "SELECT * FROM assignment LEFT OUTER JOIN submission "
+        "ON submission.assignment_id = assignment.id AND submission.student_id = ?",
+        lambda a, s, t: (s,)),
+    '教师的作业列表': (
+        "SELECT * FROM assignment WHERE teacher_id = ?",
+        lambda a, s, t: (t,)),
+}
+
+
+def seed(conn, num_submissions, num_teachers=20, num_assignments=500):
+    num_students = max(1, num_submissions // num_assignments)
+    users = [(i, f"t{i}", 'teacher', f"老师{i}") for i in range(1, num_teachers + 1)]
+    users += [(num_teachers + i, f"s{i}", 'student', f"学生{i}") for i in range(1, num_students + 1)]
+    conn.executemany("INSERT INTO user VALUES (?, ?, ?, ?)", users)
+    conn.executemany("INSERT INTO assignment VALUES (?, ?, ?)",
+                     [(i, f"作业{i}", random.randint(1, num_teachers))
+                      for i in range(1, num_assignments + 1)])
+    conn.executemany("INSERT INTO submission (assignment_id, student_id, file_name) VALUES (?, ?, ?)",
+                     ((a, num_teachers + s, 'hw.docx')
+                      for a in range(1, num_assignments + 1)
+                      for s in range(1, num_students + 1)))
+    conn.commit()
+    return num_teachers, num_students, num_assignments
+
+
+def run_queries(conn, sizes, iterations=200):
+    num_teachers, num_students, num_assignments = sizes
+    rng = random.Random(42)
+    results = {}
+    for name, (sql, make_params) in QUERIES.items():
+        start = time.perf_counter()
+        for _ in range(iterations):
+            params = make_params(rng.randint(1, num_assignments),
+                                 num_teachers + rng.randint(1, num_students),
+                                 rng.randint(1, num_teachers))
+            conn.execute(sql, params).fetchall()
+        results[name] = (time.perf_counter() - start) / iterations * 1000
+    return results
+
+
+def main():
+    num_submissions = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, 'bench.db'))
+        conn.executescript(SCHEMA)
+        sizes = seed(conn, num_submissions)
+        print(f"📦 已生成 {num_submissions} 条提交记录")
+
+        before = run_queries(conn, sizes)
+        conn.executescript(INDEXES)
+        conn.execute("ANALYZE")
+        after = run_queries(conn, sizes)
+        conn.close()
+
+    print(f"{'查询':<20}{'无索引(ms)':>12}{'有索引(ms)':>12}{'加速':>10}")
+    for name in QUERIES:
+        print(f"{name:<20}{before[name]:>12.3f}{after[name]:>12.3f}{before[name] / after[name]:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+# load_test.py
+"""
+Flask应用的端到端HTTP压力测试
+
+在临时目录中创建SQLite数据库并批量生成老师、学生、作业和提交，
+在进程内以多线程HTTP服务器启动app.py，模拟多个用户并发访问：
+学生登录、查看学生面板、打开并提交作业，老师登录、查看作业提交情况。
+测试期间关闭大模型评分和语音合成，不访问任何外部服务。
+最后按路由输出请求速率和延迟的p50/p95/p99。
+
+用法：
+    python benchmarks/load_test.py --students 500 --assignments 20 --users 32 --duration 30
+"""
+import argparse
+import io
+import logging
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('MY_LONGCAT_API_KEY', 'load-test-key')
+os.environ.setdefault('MY_DEEPSEEK_API_KEY', 'load-test-key')
+
+import requests  # noqa: E402
+
+PASSWORD = '123'
+
+
+def percentile(values, p):
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(p / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def make_docx():
+    from docx import Document
+    doc = Document()
+    doc.add_paragraph("##Begin")
+    for i in range(1, 5):
+        doc.add_paragraph(f"题目{i}")
+        doc.add_paragraph("for i in range(10):\n    print(i)")
+        doc.add_paragraph("运行结果")
+        doc.add_paragraph("\n".join(str(n) for n in range(10)))
+    doc.add_paragraph("##End")
+    buf = io.BytesIO()
+    doc.save(buf)
+    return buf.getvalue()
+
+
+def seed(app_module, application, teachers, students, assignments, submissions_per_assignment):
+    """批量生成测试数据，返回(老师用户名列表, 学生用户名列表, 作业id列表)"""
+    db, User, Assignment, Submission = (app_module.db, app_module.User,
+                                        app_module.Assignment, app_module.Submission)
+    with application.app_context():
+        app_module.init_db()
+        db.session.bulk_insert_mappings(User, [
+            {'username': f"lt_teacher{i}", 'password': PASSWORD, 'role': 'teacher', 'name': f"老师{i}"}
+            for i in range(teachers)])
+        db.session.bulk_insert_mappings(User, [
+            {'username': f"lt_student{i}", 'password': PASSWORD, 'role': 'student', 'name': f"学生{i}"}
+            for i in range(students)])
+        db.session.commit()
+
+        teacher_rows = User.query.filter(User.username.like('lt_teacher%')).all()
+        student_ids = [u.id for u in User.query.filter(User.username.like('lt_student%'))]
+        db.session.bulk_insert_mappings(Assignment, [
+            {'title': f"作业{i}", 'content': "完成以下编程题", 'teacher_id': teacher_rows[i % teachers].id}
+            for i in range(assignments)])
+        db.session.commit()
+
+        assignment_rows = Assignment.query.filter(
+            Assignment.teacher_id.in_([t.id for t in teacher_rows])).all()
+        db.session.bulk_insert_mappings(Submission, [
+            {'assignment_id': a.id, 'student_id': student_id, 'content': "已完成",
+             'extracted_text': "##Begin\n题目1\nprint('hello')\n##End\n"}
+            for a in assignment_rows
+            for student_id in random.sample(student_ids, min(submissions_per_assignment, len(student_ids)))])
+        db.session.commit()
+
+        teacher_assignments = defaultdict(list)
+        for a in assignment_rows:
+            teacher_assignments[a.teacher.username].append(a.id)
+        return (dict(teacher_assignments),
+                [f"lt_student{i}" for i in range(students)],
+                [a.id for a in assignment_rows])
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def request(self, session, route, method, url, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = session.request(method, url, allow_redirects=False, **kwargs)
+            ok = response.status_code < 400
+        except requests.RequestException:
+            ok = False
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.latencies[route].append(elapsed)
+            if not ok:
+                self.errors[route] += 1
+
+
+def student_user(base, username, assignment_ids, docx, recorder, deadline):
+    session = requests.Session()
+    recorder.request(session, 'POST /login', 'POST', f"{base}/login",
+                     data={'username': username, 'password': PASSWORD})
+    while time.time() < deadline:
+        recorder.request(session, 'GET /student/dashboard', 'GET', f"{base}/student/dashboard")
+        assignment_id = random.choice(assignment_ids)
+        url = f"{base}/student/submit_assignment/{assignment_id}"
+        recorder.request(session, 'GET /student/submit_assignment/<id>', 'GET', url)
+        recorder.request(session, 'POST /student/submit_assignment/<id>', 'POST', url,
+                         data={'content': '压力测试提交'},
+                         files={'file': ('homework.docx', docx)})
+
+
+def teacher_user(base, username, assignment_ids, recorder, deadline):
+    session = requests.Session()
+    recorder.request(session, 'POST /login', 'POST', f"{base}/login",
+                     data={'username': username, 'password': PASSWORD})
+    while time.time() < deadline:
+        assignment_id = random.choice(assignment_ids)
+        recorder.request(session, 'GET /teacher/view_submissions/<id>', 'GET',
+                         f"{base}/teacher/view_submissions/{assignment_id}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Flask应用HTTP压力测试')
+    parser.add_argument('--teachers', type=int, default=5)
+    parser.add_argument('--students', type=int, default=300)
+    parser.add_argument('--assignments', type=int, default=20)
+    parser.add_argument('--submissions-per-assignment', type=int, default=200)
+    parser.add_argument('--users', type=int, default=32, help='并发虚拟用户数')
+    parser.add_argument('--teacher-ratio', type=float, default=0.1, help='虚拟用户中老师的比例')
+    parser.add_argument('--duration', type=float, default=20, help='压测时长（秒）')
+    parser.add_argument('--keep', action='store_true', help='保留临时目录')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='homework_load_')
+    os.chdir(workdir)
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'load_test.db')}"
+
+    from config import Config
+    Config.IS_LLM_RUN = False
+    Config.LOCAL_GRADING = False
+    Config.IS_SOUND_ON = False
+    Config.SQLALCHEMY_DATABASE_URI = os.environ['DATABASE_URL']
+
+    import app as app_module
+    from werkzeug.serving import make_server
+
+    application = app_module.create_app()
+    teacher_assignments, students, assignment_ids = seed(
+        app_module, application, args.teachers, args.students, args.assignments, args.submissions_per_assignment)
+    print(f"📦 测试数据：{args.teachers} 位老师，{args.students} 位学生，{args.assignments} 个作业")
+
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server('127.0.0.1', 0, application, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+
+    docx = make_docx()
+    recorder = Recorder()
+    deadline = time.time() + args.duration
+    num_teachers = max(1, round(args.users * args.teacher_ratio))
+    threads = []
+    for i in range(args.users):
+        if i < num_teachers:
+            username = random.choice(list(teacher_assignments))
+            target = teacher_user
+            thread_args = (base, username, teacher_assignments[username], recorder, deadline)
+        else:
+            target = student_user
+            thread_args = (base, random.choice(students), assignment_ids, docx, recorder, deadline)
+        threads.append(threading.Thread(target=target, args=thread_args))
+
+    start = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.time() - start
+    server.shutdown()
+
+    print(f"\n{'路由':<40}{'请求数':>8}{'失败':>6}{'req/s':>8}{'平均(ms)':>10}"
+          f"{'p50(ms)':>9}{'p95(ms)':>9}{'p99(ms)':>9}")
+    for route, values in sorted(recorder.latencies.items()):
+        ms = [v * 1000 for v in values]
+        print(f"{route:<40}{len(ms):>8}{recorder.errors[route]:>6}{len(ms) / elapsed:>8.1f}"
+              f"{statistics.mean(ms):>10.1f}{percentile(ms, 50):>9.1f}"
+              f"{percentile(ms, 95):>9.1f}{percentile(ms, 99):>9.1f}")
+    total = sum(len(v) for v in recorder.latencies.values())
+    print(f"\n合计 {total} 个请求，{total / elapsed:.1f} req/s，并发用户 {args.users}，耗时 {elapsed:.1f}s")
+
+    os.chdir(ROOT)
+    if args.keep:
+        print(f"临时目录：{workdir}")
+    else:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
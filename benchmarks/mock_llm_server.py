@@ -0,0 +1,203 @@
+# mock_llm_server.py
+"""
+本地模拟的OpenAI兼容chat-completions接口，用于离线测试评分性能
+
+支持可配置的响应延迟分布、按比例注入429限流和超时、流式(stream: true)响应。
+返回的评分内容符合Promptconfig.SYSTEM_PROMPT的输出格式。
+
+用法：
+    python benchmarks/mock_llm_server.py --port 8765 --latency 2.0 --jitter 0.5 --rate-429 0.05
+    然后设置环境变量 MY_LLM_API_URL=http://127.0.0.1:8765/v1/chat/completions 启动应用
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MockOptions:
+    def __init__(self, latency=1.0, jitter=0.3, distribution='lognormal', rate_429=0.0,
+                 rate_timeout=0.0, hang_seconds=60.0, retry_after=1, chunk_delay=0.02):
+        """
+        Args:
+            latency: 平均响应延迟（秒）
+            jitter: 延迟的离散程度（正态分布的标准差 / 对数正态分布的sigma）
+            distribution: 延迟分布，fixed、normal或lognormal
+            rate_429: 返回429限流响应的概率
+            rate_timeout: 不响应（挂起hang_seconds秒）的概率，用于触发客户端超时
+            hang_seconds: 模拟超时时挂起的时间
+            retry_after: 429响应的Retry-After头（秒）
+            chunk_delay: 流式响应中相邻片段的间隔（秒）
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.distribution = distribution
+        self.rate_429 = rate_429
+        self.rate_timeout = rate_timeout
+        self.hang_seconds = hang_seconds
+        self.retry_after = retry_after
+        self.chunk_delay = chunk_delay
+
+    def sample_latency(self):
+        if self.distribution == 'fixed':
+            return self.latency
+        if self.distribution == 'normal':
+            return max(0.0, random.gauss(self.latency, self.jitter))
+        # 对数正态分布，均值为latency，长尾更接近真实的大模型接口
+        mu = -self.jitter ** 2 / 2
+        return self.latency * random.lognormvariate(mu, self.jitter)
+
+
+class MockStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {'requests': 0, 'ok': 0, 'rate_limited': 0, 'timeouts': 0}
+
+    def record(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+
+def make_evaluation():
+    """生成一份随机的评分结果文本"""
+    correctness = random.randint(30, 50)
+    knowledge = random.randint(20, 35)
+    readability = random.randint(5, 10)
+    robustness = random.randint(1, 5)
+    total = correctness + knowledge + readability + robustness
+    return (f"完成题目数量：4\n"
+            f"★★总分★★:{total}\n"
+            f"★★详细评分★★\n"
+            f"正确性:\"{correctness}\"\n"
+            f"知识点使用:\"{knowledge}\",\n"
+            f"可读性:\"{readability}\",\n"
+            f"健壮性:\"{robustness}\",\n"
+            f"优点:\"代码结构清晰，完成了题目要求\",\n"
+            f"缺点:\"部分边界条件没有处理\",\n"
+            f"建议:\"增加输入校验和异常处理\"")
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        options, stats = self.server.options, self.server.stats
+        stats.record('requests')
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+
+        roll = random.random()
+        if roll < options.rate_timeout:
+            stats.record('timeouts')
+            time.sleep(options.hang_seconds)
+            self.close_connection = True
+            return
+        if roll < options.rate_timeout + options.rate_429:
+            stats.record('rate_limited')
+            self._send_json(429, {'error': {'message': 'Rate limit exceeded'}},
+                            {'Retry-After': str(options.retry_after)})
+            return
+
+        time.sleep(options.sample_latency())
+        evaluation = make_evaluation()
+        stats.record('ok')
+        if body.get('stream'):
+            self._send_stream(body, evaluation, options.chunk_delay)
+        else:
+            self._send_json(200, {
+                'id': 'chatcmpl-mock',
+                'object': 'chat.completion',
+                'model': body.get('model'),
+                'choices': [{'index': 0, 'finish_reason': 'stop',
+                             'message': {'role': 'assistant', 'content': evaluation}}],
+                'usage': {'prompt_tokens': 0, 'completion_tokens': len(evaluation),
+                          'total_tokens': len(evaluation)},
+            })
+
+    def _send_json(self, status, payload, headers=None):
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_stream(self, body, evaluation, chunk_delay):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        def write_chunk(data):
+            self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+            self.wfile.flush()
+
+        for i in range(0, len(evaluation), 8):
+            chunk = {'id': 'chatcmpl-mock', 'object': 'chat.completion.chunk', 'model': body.get('model'),
+                     'choices': [{'index': 0, 'delta': {'content': evaluation[i:i + 8]}}]}
+            write_chunk(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode('utf-8'))
+            time.sleep(chunk_delay)
+        write_chunk(b"data: [DONE]\n\n")
+        write_chunk(b"")
+
+
+def start_mock_server(host='127.0.0.1', port=0, options=None):
+    """
+    在后台线程中启动模拟服务器
+
+    Returns:
+        (server, 接口URL)，调用server.shutdown()停止
+    """
+    server = ThreadingHTTPServer((host, port), MockLLMHandler)
+    server.daemon_threads = True
+    server.options = options or MockOptions()
+    server.stats = MockStats()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://{host}:{server.server_port}/v1/chat/completions"
+    return server, url
+
+
+def add_option_arguments(parser):
+    parser.add_argument('--latency', type=float, default=1.0, help='平均响应延迟（秒）')
+    parser.add_argument('--jitter', type=float, default=0.3, help='延迟离散程度')
+    parser.add_argument('--distribution', choices=['fixed', 'normal', 'lognormal'], default='lognormal')
+    parser.add_argument('--rate-429', type=float, default=0.0, help='返回429的概率')
+    parser.add_argument('--rate-timeout', type=float, default=0.0, help='不响应的概率')
+    parser.add_argument('--hang-seconds', type=float, default=60.0, help='模拟超时时挂起的秒数')
+    parser.add_argument('--retry-after', type=int, default=1, help='429响应的Retry-After（秒）')
+    parser.add_argument('--chunk-delay', type=float, default=0.02, help='流式片段间隔（秒）')
+
+
+def options_from_args(args):
+    return MockOptions(latency=args.latency, jitter=args.jitter, distribution=args.distribution,
+                       rate_429=args.rate_429, rate_timeout=args.rate_timeout,
+                       hang_seconds=args.hang_seconds, retry_after=args.retry_after,
+                       chunk_delay=args.chunk_delay)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地模拟大模型接口')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    add_option_arguments(parser)
+    args = parser.parse_args()
+
+    server, url = start_mock_server(args.host, args.port, options_from_args(args))
+    print(f"🤖 模拟大模型接口已启动：{url}")
+    print(f"   设置环境变量 MY_LLM_API_URL={url} 后启动应用即可使用")
+    try:
+        while True:
+            time.sleep(10)
+            print(f"📈 {server.stats.counters}")
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+# database.py
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+from config import Config
+
+
+def normalize_database_uri(uri):
+    """兼容部分平台提供的postgres://写法（SQLAlchemy只识别postgresql://）"""
+    if uri.startswith('postgres://'):
+        return 'postgresql://' + uri[len('postgres://'):]
+    return uri
+
+
+def engine_options(uri):
+    """
+    根据数据库类型生成SQLALCHEMY_ENGINE_OPTIONS
+
+    SQLite文件数据库和PostgreSQL都使用连接池，连接数等参数来自Config；
+    SQLite内存数据库由SQLAlchemy使用单连接池，不能设置连接池参数
+    """
+    url = make_url(uri)
+    if url.get_backend_name() == 'sqlite':
+        if url.database in (None, '', ':memory:'):
+            return {}
+        return {
+            'pool_size': Config.DB_POOL_SIZE,
+            'max_overflow': Config.DB_MAX_OVERFLOW,
+            'pool_timeout': Config.DB_POOL_TIMEOUT,
+            # 上传和评分线程会在不同线程中使用连接池里的连接
+            'connect_args': {'check_same_thread': False,
+                             'timeout': Config.SQLITE_BUSY_TIMEOUT / 1000},
+        }
+    return {
+        'pool_size': Config.DB_POOL_SIZE,
+        'max_overflow': Config.DB_MAX_OVERFLOW,
+        'pool_timeout': Config.DB_POOL_TIMEOUT,
+        'pool_recycle': Config.DB_POOL_RECYCLE,
+        'pool_pre_ping': True,  # 使用前检测连接，避免数据库重启或空闲断开后报错
+    }
+
+
+def configure_engine(engine):
+    """
+    为SQLite连接设置PRAGMA：WAL模式下读不阻塞写、写不阻塞读，
+    synchronous=NORMAL在WAL模式下仍保证数据库一致性，busy_timeout让并发写入排队等待而不是立即报错
+    """
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA journal_mode={Config.SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous={Config.SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout={int(Config.SQLITE_BUSY_TIMEOUT)}")
+        cursor.close()
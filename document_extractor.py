@@ -0,0 +1,19 @@
+# document_extractor.py
+from metrics import metrics
+
+
+def extract_docx_text(file_path):
+    """读取Word文档的文本内容，每个段落一行"""
+    # python-docx导入较慢，第一次提取时才导入
+    from docx import Document
+    with metrics.timer('docx_extract_seconds'):
+        doc = Document(file_path)
+        return "".join(paragraph.text + "\n" for paragraph in doc.paragraphs)
+
+
+def extract_text(file_path):
+    """读取作业文件的文本内容，支持.docx和纯文本文件"""
+    if file_path.endswith('.docx'):
+        return extract_docx_text(file_path)
+    with open(file_path, encoding='utf-8') as f:
+        return f.read()
@@ -0,0 +1,56 @@
+# file_serving.py
+import os
+from urllib.parse import quote
+
+from flask import current_app, request
+from werkzeug.utils import send_file
+
+from config import Config
+
+# 文件发送方式
+SERVE_DIRECT = 'direct'  # 由Flask读取文件并发送
+SERVE_X_SENDFILE = 'x-sendfile'  # Apache mod_xsendfile / lighttpd
+SERVE_X_ACCEL = 'x-accel-redirect'  # nginx internal location
+
+
+def send_stored_file(path, download_name, etag=None, mimetype=None):
+    """
+    发送上传的文件，支持条件请求（ETag/Last-Modified）和断点续传（Range）
+
+    Config.FILE_SERVING_MODE为x-sendfile或x-accel-redirect时，Flask只返回响应头，
+    由前置的Web服务器读取并发送文件内容（Range也由Web服务器处理）
+
+    Args:
+        path: 文件路径
+        download_name: 下载时的文件名
+        etag: 文件的ETag，默认由文件修改时间、大小和路径生成；按内容存储的文件可以直接使用内容哈希
+        mimetype: 文件类型，默认按文件名推断
+    """
+    mode = Config.FILE_SERVING_MODE
+    environ = request.environ
+    if mode != SERVE_DIRECT:
+        # Range由Web服务器处理，这里只判断If-None-Match/If-Modified-Since
+        environ = {key: value for key, value in environ.items() if key not in ('HTTP_RANGE', 'HTTP_IF_RANGE')}
+
+    response = send_file(
+        os.path.abspath(path),
+        environ,
+        mimetype=mimetype,
+        as_attachment=True,
+        download_name=download_name,
+        conditional=True,
+        etag=etag if etag is not None else True,
+        max_age=Config.DOWNLOAD_CACHE_MAX_AGE,
+        use_x_sendfile=mode in (SERVE_X_SENDFILE, SERVE_X_ACCEL),
+        response_class=current_app.response_class,
+    )
+    # 作业文件只允许本人和老师访问，不允许共享缓存保存
+    response.cache_control.private = True
+
+    if mode == SERVE_X_ACCEL and 'X-Sendfile' in response.headers:
+        # nginx需要internal location下的URI而不是文件系统路径
+        relative = os.path.relpath(os.path.abspath(path), os.path.abspath(current_app.config['UPLOAD_FOLDER']))
+        uri = Config.X_ACCEL_REDIRECT_PREFIX.rstrip('/') + '/' + quote(relative.replace(os.sep, '/'))
+        del response.headers['X-Sendfile']
+        response.headers['X-Accel-Redirect'] = uri
+    return response
@@ -0,0 +1,96 @@
+# file_storage.py
+import hashlib
+import os
+import tempfile
+import threading
+
+from config import Config
+
+
+class ContentAddressedStorage:
+    """
+    按内容哈希存储上传文件
+
+    上传的文件边读取边计算SHA-256并分块写入临时文件，完成后移动到
+    <根目录>/<哈希前2位>/<哈希第3-4位>/<哈希><扩展名>，内容相同的文件只保存一份
+
+    同一个文件可能被多个提交共用：save()返回的文件在调用方提交数据库事务并调用release()之前
+    视为正在使用，delete_unreferenced()不会删除，避免删除旧文件时误删刚上传的相同内容的文件
+    """
+
+    def __init__(self, root, chunk_size=None):
+        self.root = root
+        self.chunk_size = chunk_size or Config.UPLOAD_CHUNK_SIZE
+        self._lock = threading.Lock()
+        self._in_use = {}  # 已保存但数据库记录尚未提交的文件路径 -> 引用数
+
+    def path_for(self, digest, extension=''):
+        """哈希对应的存储路径"""
+        return os.path.join(self.root, digest[:2], digest[2:4], f"{digest}{extension}")
+
+    def save(self, stream, extension=''):
+        """
+        保存上传的文件流
+
+        Args:
+            stream: 可读的二进制文件对象（例如FileStorage.stream）
+            extension: 文件扩展名（含点号），保留扩展名以便按类型处理
+
+        Returns:
+            (文件哈希, 存储路径)；数据库记录提交（或回滚）后需要调用release(存储路径)
+        """
+        tmp_dir = os.path.join(self.root, 'tmp')
+        os.makedirs(tmp_dir, exist_ok=True)
+        sha256 = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                while True:
+                    chunk = stream.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    sha256.update(chunk)
+                    f.write(chunk)
+            digest = sha256.hexdigest()
+            path = self.path_for(digest, extension.lower())
+            # 与delete_unreferenced()互斥：判断文件是否存在到登记为正在使用之间，文件不会被删除
+            with self._lock:
+                if os.path.exists(path):
+                    # 相同内容的文件已存在，直接复用
+                    os.remove(tmp_path)
+                else:
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    os.replace(tmp_path, path)
+                self._in_use[path] = self._in_use.get(path, 0) + 1
+            return digest, path
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def release(self, path):
+        """save()返回的文件对应的数据库记录已提交或回滚，不再视为正在使用"""
+        if not path:
+            return
+        with self._lock:
+            count = self._in_use.get(path, 0) - 1
+            if count > 0:
+                self._in_use[path] = count
+            else:
+                self._in_use.pop(path, None)
+
+    def delete_unreferenced(self, path, is_referenced):
+        """
+        删除不再被引用的文件
+
+        Args:
+            path: 存储路径
+            is_referenced: 判断数据库中是否还有记录引用该文件的函数，在锁内调用
+        """
+        if not path:
+            return
+        with self._lock:
+            if path in self._in_use or is_referenced(path):
+                return
+            if os.path.exists(path):
+                os.remove(path)
@@ -0,0 +1,129 @@
+# grade_export.py
+import csv
+import io
+import re
+from datetime import timedelta
+from xml.sax.saxutils import escape
+
+from score_parser import DIMENSIONS
+from zip_stream import stream_zip
+
+HEADERS = ['作业', '学号', '姓名', '提交时间', '是否迟交', '总分'] + list(DIMENSIONS.values()) + ['成绩']
+
+# XML 1.0不允许的控制字符
+_ILLEGAL_XML_CHARS = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+# 以这些字符开头的单元格会被Excel当作公式执行（CSV注入）
+_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def is_late(submitted_at, due_date):
+    """
+    判断是否迟交
+
+    发布作业时截止时间只精确到日期（当天0点），此时截止日当天提交都不算迟交
+    """
+    if submitted_at is None or due_date is None:
+        return False
+    deadline = due_date
+    if (due_date.hour, due_date.minute, due_date.second) == (0, 0, 0):
+        deadline = due_date + timedelta(days=1)
+    return submitted_at >= deadline
+
+
+def grade_row(row):
+    """把查询结果的一行转换为导出的一行（与HEADERS对应）"""
+    return [
+        row.title,
+        row.username,
+        row.name,
+        row.submitted_at.strftime('%Y-%m-%d %H:%M:%S') if row.submitted_at else '',
+        '是' if is_late(row.submitted_at, row.due_date) else '否',
+        row.total_score,
+    ] + [getattr(row, dimension) for dimension in DIMENSIONS] + [row.grade or '']
+
+
+def csv_cell(value):
+    """姓名、学号等由用户填写的文本以公式字符开头时加上'，Excel按文本显示而不执行"""
+    if value is None:
+        return ''
+    if isinstance(value, str) and value.startswith(_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def stream_csv(rows):
+    """逐行生成CSV数据（UTF-8带BOM，Excel打开时中文不乱码）"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(HEADERS)
+    yield buffer.getvalue().encode('utf-8-sig')
+    for row in rows:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow([csv_cell(value) for value in row])
+        yield buffer.getvalue().encode('utf-8')
+
+
+def _xlsx_cell(value):
+    if value is None or value == '':
+        return '<c/>'
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f'<c><v>{value}</v></c>'
+    text = escape(_ILLEGAL_XML_CHARS.sub('', str(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _xlsx_row(values):
+    return ('<row>' + ''.join(_xlsx_cell(value) for value in values) + '</row>').encode('utf-8')
+
+
+def _xlsx_sheet(rows):
+    yield ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+           '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>').encode('utf-8')
+    yield _xlsx_row(HEADERS)
+    for row in rows:
+        yield _xlsx_row(row)
+    yield b'</sheetData></worksheet>'
+
+
+_XLSX_PARTS = [
+    ('[Content_Types].xml',
+     '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+     '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+     '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+     '<Default Extension="xml" ContentType="application/xml"/>'
+     '<Override PartName="/xl/workbook.xml" '
+     'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+     '<Override PartName="/xl/worksheets/sheet1.xml" '
+     'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+     '</Types>'),
+    ('_rels/.rels',
+     '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+     '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+     '<Relationship Id="rId1" '
+     'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+     'Target="xl/workbook.xml"/></Relationships>'),
+    ('xl/workbook.xml',
+     '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+     '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+     'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+     '<sheets><sheet name="成绩" sheetId="1" r:id="rId1"/></sheets></workbook>'),
+    ('xl/_rels/workbook.xml.rels',
+     '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+     '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+     '<Relationship Id="rId1" '
+     'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+     'Target="worksheets/sheet1.xml"/></Relationships>'),
+]
+
+
+def stream_xlsx(rows):
+    """
+    逐行生成XLSX数据
+
+    XLSX是由若干XML文件组成的ZIP包，工作表使用内联字符串逐行写出，
+    不需要openpyxl，也不需要先把整张表放在内存里
+    """
+    entries = [(name, content.encode('utf-8')) for name, content in _XLSX_PARTS]
+    entries.append(('xl/worksheets/sheet1.xml', _xlsx_sheet(rows)))
+    return stream_zip(entries)
@@ -0,0 +1,152 @@
+# grading_cache.py
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+from config import Config
+
+
+class GradingCache:
+    """大模型评分结果缓存，以(模型, 温度, 系统提示词, 作业内容)的哈希为键持久化在SQLite中"""
+
+    def __init__(self, db_path=None, max_entries=None, max_age=None):
+        """
+        Args:
+            db_path: SQLite缓存文件路径
+            max_entries: 最多保存的缓存条目数，超出时淘汰最久未访问的条目
+            max_age: 缓存条目的最长保存时间（秒），过期条目会被删除
+        """
+        self.db_path = db_path or Config.GRADING_CACHE_PATH
+        self.max_entries = max_entries or Config.GRADING_CACHE_MAX_ENTRIES
+        self.max_age = max_age or Config.GRADING_CACHE_MAX_AGE
+
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._key_locks = {}  # 键 -> [锁, 使用该锁的线程数]
+        self._schema_ready = False
+
+    @staticmethod
+    def make_key(model, temperature, system_prompt, content):
+        """计算缓存键：相同模型、参数、提示词和作业内容得到相同的键"""
+        payload = json.dumps([model, temperature, system_prompt, content], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=Config.TIMEOUT)
+        if not self._schema_ready:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS grading_cache (
+                    key TEXT PRIMARY KEY,
+                    result TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )""")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_grading_cache_accessed_at "
+                         "ON grading_cache (accessed_at)")
+            conn.commit()
+            self._schema_ready = True
+        return conn
+
+    def get(self, key):
+        """读取缓存结果，未命中或已过期返回None"""
+        result = self._lookup(key)
+        self._count(result is not None)
+        return result
+
+    def _lookup(self, key):
+        now = time.time()
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT result, created_at FROM grading_cache WHERE key = ?",
+                               (key,)).fetchone()
+            if row is None or now - row[1] > self.max_age:
+                return None
+            conn.execute("UPDATE grading_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            conn.commit()
+        finally:
+            conn.close()
+        return row[0]
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def put(self, key, result):
+        """写入缓存并执行容量与过期淘汰"""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("INSERT OR REPLACE INTO grading_cache (key, result, created_at, accessed_at) "
+                         "VALUES (?, ?, ?, ?)", (key, result, now, now))
+            conn.execute("DELETE FROM grading_cache WHERE created_at < ?", (now - self.max_age,))
+            conn.execute("""
+                DELETE FROM grading_cache WHERE key IN (
+                    SELECT key FROM grading_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )""", (self.max_entries,))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def get_or_compute(self, key, compute):
+        """
+        命中缓存直接返回，否则调用compute()计算并缓存结果
+
+        同一个键同时只会计算一次，其他线程等待计算完成后读取缓存。
+        以"❌"开头的失败结果不缓存。
+        """
+        result = self._lookup(key)
+        if result is not None:
+            self._count(True)
+            return result
+
+        # 每个键的锁记录使用它的线程数，最后一个线程用完才移除，
+        # 避免有线程还在等待时锁被移除、后来的线程新建锁后重复计算
+        with self._lock:
+            entry = self._key_locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                # 等待期间其他线程可能已完成计算
+                result = self._lookup(key)
+                self._count(result is not None)
+                if result is not None:
+                    return result
+
+                result = compute()
+                if result and not result.startswith("❌"):
+                    self.put(key, result)
+                return result
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._key_locks[key]
+
+    def stats(self):
+        """缓存统计信息，用于监控"""
+        conn = self._connect()
+        try:
+            entries = conn.execute("SELECT COUNT(*) FROM grading_cache").fetchone()[0]
+        finally:
+            conn.close()
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / total, 4) if total else 0.0,
+            'entries': entries,
+            'max_entries': self.max_entries,
+            'max_age': self.max_age,
+        }
+
+
+# 进程内共享的评分缓存
+grading_cache = GradingCache()
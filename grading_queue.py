@@ -0,0 +1,176 @@
+# grading_queue.py
+import threading
+import time
+from datetime import datetime, timedelta
+
+from config import Config
+
+
+class GradingQueue:
+    """后台评分队列：评分任务持久化在数据库表中，由工作线程池异步执行"""
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    def __init__(self, app, db, job_model, grade_func, num_workers=None, poll_interval=None):
+        """
+        Args:
+            app: Flask应用实例，工作线程在其app_context中访问数据库
+            db: SQLAlchemy实例
+            job_model: 评分任务模型（GradingJob）
+            grade_func: 评分函数，参数为submission_id，返回评分结果字符串，或(评分结果, 保存函数)：
+                保存函数在确认任务没有过期后调用，只修改数据库会话，与任务状态在同一个事务中提交
+            num_workers: 工作线程数量
+            poll_interval: 空闲时轮询数据库的间隔（秒）
+        """
+        self.app = app
+        self.db = db
+        self.job_model = job_model
+        self.grade_func = grade_func
+        self.num_workers = num_workers or Config.GRADING_WORKERS
+        self.poll_interval = poll_interval or Config.GRADING_POLL_INTERVAL
+
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._workers = []
+
+    def ensure_started(self):
+        """启动工作线程（只启动一次，可重复调用）"""
+        if self._workers:
+            return
+        with self._lock:
+            if self._workers:
+                return
+            for i in range(self.num_workers):
+                worker = threading.Thread(target=self._worker_loop,
+                                          name=f"grading-worker-{i}",
+                                          daemon=True)
+                worker.start()
+                self._workers.append(worker)
+            print(f"🚀 评分队列已启动，工作线程数：{self.num_workers}")
+
+    def enqueue(self, submission_id):
+        """
+        将提交加入评分队列，已有任务的提交会被重置为待评分
+
+        需要在app_context中调用，会提交当前数据库会话
+        """
+        return self.enqueue_many([submission_id])[0]
+
+    def enqueue_many(self, submission_ids):
+        """批量加入评分队列，所有任务在同一个事务中写入，返回任务列表"""
+        Job = self.job_model
+        submission_ids = list(submission_ids)
+        existing = {}
+        if submission_ids:
+            existing = {job.submission_id: job for job in
+                        Job.query.filter(Job.submission_id.in_(submission_ids)).all()}
+
+        jobs = []
+        for submission_id in submission_ids:
+            job = existing.get(submission_id)
+            if job is None:
+                job = Job(submission_id=submission_id)
+                self.db.session.add(job)
+            job.status = self.PENDING
+            job.result = None
+            job.error = None
+            job.attempts = 0
+            job.started_at = None
+            job.finished_at = None
+            jobs.append(job)
+        self.db.session.commit()
+
+        self.ensure_started()
+        self._wakeup.set()
+        return jobs
+
+    def get_job(self, submission_id):
+        """查询提交对应的评分任务，没有则返回None"""
+        return self.job_model.query.filter_by(submission_id=submission_id).first()
+
+    def _worker_loop(self):
+        while True:
+            try:
+                with self.app.app_context():
+                    claimed = self._claim_next_job()
+                    if claimed is not None:
+                        self._run_job(*claimed)
+                        continue
+            except Exception as e:
+                print(f"❌ 评分队列工作线程错误：{e}")
+
+            # 没有待评分任务时等待唤醒或定时轮询
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def _claim_next_job(self):
+        """原子地领取一个待评分任务，返回(job_id, submission_id, started_at)"""
+        Job = self.job_model
+        session = self.db.session
+        self._requeue_stale_jobs()
+
+        while True:
+            job = Job.query.filter_by(status=self.PENDING).order_by(Job.id).first()
+            if job is None:
+                session.rollback()
+                return None
+
+            started_at = datetime.utcnow()
+            # 仅当任务仍为pending时才更新，防止多个线程/进程重复领取
+            claimed = Job.query.filter_by(id=job.id, status=self.PENDING).update(
+                {'status': self.RUNNING,
+                 'started_at': started_at,
+                 'attempts': Job.attempts + 1},
+                synchronize_session=False)
+            session.commit()
+            if claimed == 1:
+                return job.id, job.submission_id, started_at
+
+    def _requeue_stale_jobs(self):
+        """把超时未完成的running任务（例如进程崩溃遗留）重新置为pending"""
+        Job = self.job_model
+        deadline = datetime.utcnow() - timedelta(seconds=Config.GRADING_JOB_TIMEOUT)
+        Job.query.filter(Job.status == self.RUNNING, Job.started_at < deadline).update(
+            {'status': self.PENDING}, synchronize_session=False)
+        self.db.session.commit()
+
+    def _run_job(self, job_id, submission_id, started_at):
+        Job = self.job_model
+        start = time.time()
+        error = None
+        save = None
+        try:
+            result = self.grade_func(submission_id)
+            if isinstance(result, tuple):
+                result, save = result
+            if result is None or result.startswith("❌"):
+                error = result or "❌ 评分失败：无评分结果"
+        except Exception as e:
+            result = None
+            error = f"❌ 评分失败：{str(e)}"
+
+        job = self.db.session.get(Job, job_id)
+        if job is None:
+            return
+
+        if error is None:
+            values = {'status': self.DONE, 'result': result, 'error': None}
+        elif job.attempts < Config.GRADING_MAX_ATTEMPTS:
+            values = {'status': self.PENDING, 'error': error}
+        else:
+            values = {'status': self.FAILED, 'result': error, 'error': error}
+        values['finished_at'] = datetime.utcnow()
+
+        # 评分期间提交被更新（任务被重置）时，丢弃这次过期的结果，分数也不保存
+        updated = Job.query.filter_by(id=job_id, status=self.RUNNING, started_at=started_at).update(
+            values, synchronize_session=False)
+        if updated == 1 and error is None and save is not None:
+            save()
+        self.db.session.commit()
+        if updated != 1:
+            print(f"⏭️ 提交 {submission_id} 评分期间已重新提交，丢弃本次评分结果")
+            return
+        print(f"📊 提交 {submission_id} 评分任务结束：{values['status']}，耗时 {time.time() - start:.1f}s")
@@ -0,0 +1,92 @@
+# grading_stream.py
+import threading
+import time
+
+
+class GradingStream:
+    """一次评分的流式输出：评分线程写入文本片段，任意多个订阅者按顺序读取"""
+
+    def __init__(self):
+        self.parts = []
+        self.generation = 0  # 每次reset()加1，订阅者据此丢弃已读取的片段
+        self.result = None
+        self.closed = False
+        self._cond = threading.Condition()
+
+    def publish(self, delta):
+        with self._cond:
+            self.parts.append(delta)
+            self._cond.notify_all()
+
+    def reset(self):
+        """评分请求失败重试，丢弃之前生成的片段"""
+        with self._cond:
+            self.parts = []
+            self.generation += 1
+            self._cond.notify_all()
+
+    def close(self, result):
+        with self._cond:
+            self.result = result
+            self.closed = True
+            self._cond.notify_all()
+
+    def iter_deltas(self, deadline):
+        """
+        从头读取已生成和后续生成的文本片段，评分结束或到达截止时间后停止
+
+        Args:
+            deadline: 截止时间（time.time()），到达后即使评分未结束也停止读取
+
+        Yields:
+            文本片段；评分重试、之前的片段作废时产生None
+        """
+        index = 0
+        generation = self.generation
+        while True:
+            with self._cond:
+                if generation == self.generation and index >= len(self.parts) and not self.closed:
+                    self._cond.wait(max(0.0, deadline - time.time()))
+                reset = generation != self.generation
+                if reset:
+                    generation, index = self.generation, 0
+                parts = self.parts[index:]
+                closed = self.closed
+            if reset:
+                yield None
+            for delta in parts:
+                yield delta
+            index += len(parts)
+            if closed and index >= len(self.parts):
+                return
+            if time.time() >= deadline:
+                return
+
+
+class GradingStreamHub:
+    """进程内正在进行的流式评分，按submission_id索引，供SSE接口订阅"""
+
+    def __init__(self):
+        self._streams = {}
+        self._lock = threading.Lock()
+
+    def open(self, submission_id):
+        stream = GradingStream()
+        with self._lock:
+            self._streams[submission_id] = stream
+        return stream
+
+    def get(self, submission_id):
+        with self._lock:
+            return self._streams.get(submission_id)
+
+    def close(self, submission_id, stream, result):
+        """结束评分流；同一提交已开始新的评分时不移除新的流"""
+        stream.close(result)
+        with self._lock:
+            if self._streams.get(submission_id) is stream:
+                del self._streams[submission_id]
+
+
+# 进程内共享的评分流
+grading_streams = GradingStreamHub()
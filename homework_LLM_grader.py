@@ -1,9 +1,46 @@
 # homework_LLM_grader.py
+import argparse
+import json
 import requests
+import threading
 import time
-from typing import Dict, List
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Iterator, List, Tuple
+from requests.adapters import HTTPAdapter
 from config import Config
+from grading_cache import grading_cache
 import Promptconfig
+import rate_limiter
+from metrics import metrics
+from score_parser import DIMENSIONS, parse_grader_output
+from prompt_budget import CompactionReport, compact_prompt, count_tokens, split_questions
+
+# 可重试的HTTP状态码：限流和服务端临时错误
+RETRYABLE_STATUS_CODES = (429, 500, 502, 503, 504)
+
+_http_session = None
+_http_session_lock = threading.Lock()
+
+
+def get_http_session() -> requests.Session:
+    """
+    获取进程内共享的HTTP会话
+
+    所有判分器实例和工作线程复用同一个连接池，保持与大模型接口的keep-alive连接，
+    避免每次评分都重新建立TCP+TLS连接
+    """
+    global _http_session
+    if _http_session is None:
+        with _http_session_lock:
+            if _http_session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=Config.HTTP_POOL_CONNECTIONS,
+                                      pool_maxsize=Config.HTTP_POOL_SIZE)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _http_session = session
+    return _http_session
+
 
 class PythonCodeGrader:
     """Python程序自动判分助手"""
@@ -39,100 +76,223 @@ class PythonCodeGrader:
         {student_code}
         请根据评分标准进行客观评价。"""
 
-        data = {
-            "model": self.model,
-            "messages": [
-                {"role": "system", "content": self.system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            "temperature": Config.TEMPERATURE,
-            "max_tokens": 2000
-        }
+        return self._request_evaluation(user_prompt, max_retries)
 
-        for attempt in range(max_retries):
-            try:
-                print(f"🔍 正在评估代码 (尝试 {attempt + 1}/{max_retries})...")
+    def evaluate_code_2(self, homework_content: str, max_retries: int = 3,
+                        on_delta: Callable[[str], None] = None, facts: str = None,
+                        on_compaction: Callable[[CompactionReport], None] = None,
+                        on_reset: Callable[[], None] = None) -> str:
+        """
+        评估Python代码
 
-                response = requests.post(
-                    self.api_url,
-                    headers=self.headers,
-                    json=data,
-                    timeout=Config.TIMEOUT
-                )
-                response.raise_for_status()
+        Args:
+            homework_content: 学生提交的整份作业内容
+            max_retries: 最大重试次数
+            on_delta: 流式模式回调，大模型每生成一段文本就调用一次；为None时不使用流式接口
+            facts: 本地静态分析得到的事实（语法检查、知识点使用情况等），附在作业内容之后
+            on_compaction: 作业内容压缩到token预算后调用，参数为压缩统计（实际发送的内容的token数）
+            on_reset: 流式模式下请求失败重试前调用，之前通过on_delta发送的片段应丢弃
 
-                result = response.json()
-                evaluation = result['choices'][0]['message']['content']
+        Returns:
+            评分结果字符串
+        """
+        homework_content = self._compact(homework_content, on_compaction)
+        user_prompt = self._user_prompt(homework_content, facts)
 
-                print("✅ LLM评估完成！")
-                return evaluation
+        return self._request_evaluation(user_prompt, max_retries, on_delta, on_reset=on_reset)
 
-            except requests.exceptions.Timeout:
-                print(f"⏰ 请求超时，正在重试... ({attempt + 1}/{max_retries})")
-                if attempt < max_retries - 1:
-                    time.sleep(2)  # 等待2秒后重试
-                else:
-                    return "❌ 评分失败：请求超时，请稍后重试"
+    def evaluate_by_question(self, homework_content: str, homework_id: str, max_retries: int = 3,
+                             on_delta: Callable[[str], None] = None, max_workers: int = None,
+                             question_facts: Dict[int, str] = None,
+                             on_compaction: Callable[[CompactionReport], None] = None) -> str:
+        """
+        按题目拆分作业并发评分，每道题使用带对应知识点的系统提示词，最后合并结果
 
-            except requests.exceptions.RequestException as e:
-                return f"❌ 网络错误：{str(e)}"
+        拆分不出多道题或没有该作业的知识点配置时，退回整份作业评分
 
-            except KeyError as e:
-                return f"❌ API响应格式错误：{str(e)}"
+        Args:
+            homework_content: 学生提交的整份作业内容
+            homework_id: 作业编号，对应Promptconfig.KNOWLEDGE_POINTS的键，例如"作业2"
+            max_retries: 每道题的最大重试次数
+            on_delta: 每道题评分完成时调用一次，参数为该题的评分结果
+            max_workers: 最大并发数，默认使用Config.BATCH_CONCURRENCY
+            question_facts: 各题的静态分析事实，键为题号
+            on_compaction: 压缩统计回调，按题目评分时每道题调用一次
 
-            except Exception as e:
-                return f"❌ 未知错误：{str(e)}"
+        Returns:
+            合并后的评分结果字符串（与SYSTEM_PROMPT的输出格式一致）
+        """
+        question_facts = question_facts or {}
+        questions = split_questions(homework_content)
+        if len(questions) < 2 or homework_id not in Promptconfig.KNOWLEDGE_POINTS:
+            facts = '\n'.join(question_facts[key] for key in sorted(question_facts))
+            return self.evaluate_code_2(homework_content, max_retries, on_delta, facts, on_compaction)
 
-        return "❌ 评分失败：达到最大重试次数"
+        # 拆分后每道题分别压缩到token预算以内，整份作业超出预算时后面的题目不会被截掉
+        questions = [(question_id, self._compact(question_text, on_compaction))
+                     for question_id, question_text in questions]
 
-    def evaluate_code_2(self, homework_content: str, max_retries: int = 3) -> str:
+        print(f"🧩 {homework_id} 拆分为 {len(questions)} 道题并发评分")
+        results = {}
+        with ThreadPoolExecutor(max_workers=max_workers or Config.BATCH_CONCURRENCY,
+                                thread_name_prefix="question-grader") as executor:
+            futures = {executor.submit(self._evaluate_question, homework_id, question_id,
+                                       question_text, max_retries,
+                                       question_facts.get(question_id)): question_id
+                       for question_id, question_text in questions}
+            for future in as_completed(futures):
+                question_id = futures[future]
+                try:
+                    results[question_id] = future.result()
+                except Exception as e:
+                    results[question_id] = f"❌ 未知错误：{str(e)}"
+                if on_delta is not None and not results[question_id].startswith("❌"):
+                    on_delta(f"--- 题目{question_id} ---\n{results[question_id]}\n")
+
+        # 失败的题目单独重试一次，其他题目的结果不受影响
+        for question_id, question_text in questions:
+            if results[question_id].startswith("❌"):
+                print(f"🔁 题目{question_id} 评分失败，单独重试...")
+                results[question_id] = self._evaluate_question(homework_id, question_id,
+                                                               question_text, max_retries,
+                                                               question_facts.get(question_id))
+
+        return merge_question_results([(question_id, results[question_id])
+                                       for question_id, _ in questions])
+
+    def _evaluate_question(self, homework_id: str, question_id: int, question_text: str,
+                           max_retries: int = 3, facts: str = None) -> str:
+        # question_text已由evaluate_by_question压缩，失败重试时不再重复压缩
+        system_prompt = Promptconfig.get_system_prompt(homework_id, question_id) or self.system_prompt
+        user_prompt = self._user_prompt(question_text, facts)
+        return self._request_evaluation(user_prompt, max_retries, system_prompt=system_prompt)
+
+    @staticmethod
+    def _user_prompt(content: str, facts: str = None) -> str:
+        """组装用户提示词；有静态分析结果时才附在作业内容之后，没有时与原提示词相同（不影响评分缓存）"""
+        if facts:
+            content = f"{content}\n        {facts}"
+        return f"""
+        {content}
+        请根据评分标准进行客观评价。"""
+
+    @staticmethod
+    def _compact(content: str, on_compaction: Callable[[CompactionReport], None] = None) -> str:
+        """把作业内容压缩到输入token预算以内"""
+        content, report = compact_prompt(content)
+        if report.steps:
+            print(f"📏 作业内容已压缩：{report}")
+        if on_compaction is not None:
+            on_compaction(report)
+        return content
+
+    def _request_evaluation(self, user_prompt: str, max_retries: int = 3,
+                            on_delta: Callable[[str], None] = None,
+                            system_prompt: str = None,
+                            on_reset: Callable[[], None] = None) -> str:
         """
-        评估Python代码
+        调用大模型接口获取评分，相同的提示词和作业内容命中缓存时不再请求接口
 
         Args:
-            student_code: 学生提交的代码
-            requirements: 题目要求
+            user_prompt: 用户提示词（包含作业内容）
             max_retries: 最大重试次数
+            on_delta: 流式模式回调，命中缓存时不会被调用
+            system_prompt: 系统提示词，默认使用self.system_prompt
+            on_reset: 流式模式下重试前调用
 
         Returns:
             评分结果字符串
         """
-        user_prompt = f"""
-        {homework_content}
-        请根据评分标准进行客观评价。"""
-
+        system_prompt = system_prompt or self.system_prompt
+        cache_key = grading_cache.make_key(self.model, Config.TEMPERATURE,
+                                           system_prompt, user_prompt)
+        return grading_cache.get_or_compute(
+            cache_key, lambda: self._post_evaluation(user_prompt, max_retries, on_delta, system_prompt, on_reset))
+
+    def _post_evaluation(self, user_prompt: str, max_retries: int = 3,
+                         on_delta: Callable[[str], None] = None,
+                         system_prompt: str = None,
+                         on_reset: Callable[[], None] = None) -> str:
+        """调用大模型接口并记录耗时和token指标"""
+        system_prompt = system_prompt or self.system_prompt
+        start = time.perf_counter()
+        evaluation = self._send_evaluation(user_prompt, max_retries, on_delta, system_prompt, on_reset)
+        outcome = 'error' if evaluation.startswith("❌") else 'ok'
+        metrics.observe('llm_request_seconds', time.perf_counter() - start, model=self.model, outcome=outcome)
+        metrics.inc('llm_tokens_total', count_tokens(system_prompt + user_prompt), model=self.model, kind='prompt')
+        if outcome == 'ok':
+            metrics.inc('llm_tokens_total', count_tokens(evaluation), model=self.model, kind='completion')
+        return evaluation
+
+    def _send_evaluation(self, user_prompt: str, max_retries: int,
+                         on_delta: Callable[[str], None], system_prompt: str,
+                         on_reset: Callable[[], None] = None) -> str:
         data = {
             "model": self.model,
             "messages": [
-                {"role": "system", "content": self.system_prompt},
+                {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt}
             ],
             "temperature": Config.TEMPERATURE,
-            "max_tokens": 2000
+            "max_tokens": Config.MAX_OUTPUT_TOKENS
         }
+        if on_delta is not None:
+            data["stream"] = True
+
+        limiter = rate_limiter.get_rate_limiter(self.model)
+        request_tokens = count_tokens(system_prompt + user_prompt) + data["max_tokens"]
 
         for attempt in range(max_retries):
+            if attempt > 0 and on_reset is not None:
+                # 上一次尝试可能已经输出了部分片段，重试的输出从头开始
+                on_reset()
             try:
+                # 按模型的请求数/token数配额限流，配额不足时在本地等待
+                limiter.acquire(request_tokens)
                 print(f"🔍 正在评估代码 (尝试 {attempt + 1}/{max_retries})...")
 
-                response = requests.post(
+                response = get_http_session().post(
                     self.api_url,
                     headers=self.headers,
                     json=data,
-                    timeout=Config.TIMEOUT
+                    timeout=Config.TIMEOUT,
+                    stream=on_delta is not None
                 )
-                response.raise_for_status()
 
-                result = response.json()
-                evaluation = result['choices'][0]['message']['content']
+                # 响应用完后关闭，读完响应体的连接放回连接池复用（流式响应也一样）
+                with response:
+                    if response.status_code in RETRYABLE_STATUS_CODES:
+                        delay = rate_limiter.backoff_delay(attempt, response.headers.get('Retry-After'))
+                        if response.status_code == 429:
+                            # 被服务端限流时暂停该模型的所有请求，避免其他线程继续触发限流
+                            rate_limiter.stats.record('rate_limited')
+                            limiter.pause(delay)
+                        if attempt < max_retries - 1:
+                            rate_limiter.stats.record('retried')
+                            metrics.inc('llm_retries_total', model=self.model)
+                            print(f"⏳ 接口返回 {response.status_code}，{delay:.1f}秒后重试... ({attempt + 1}/{max_retries})")
+                            # 读完错误响应体，连接才能放回连接池
+                            response.content
+                            if response.status_code != 429:
+                                time.sleep(delay)
+                            continue
+                    response.raise_for_status()
+
+                    if on_delta is not None:
+                        evaluation = self._read_stream(response, on_delta)
+                    else:
+                        result = response.json()
+                        evaluation = result['choices'][0]['message']['content']
 
-                print("✅ LLM评估完成！")
-                return evaluation
+                    print("✅ LLM评估完成！")
+                    return evaluation
 
             except requests.exceptions.Timeout:
                 print(f"⏰ 请求超时，正在重试... ({attempt + 1}/{max_retries})")
                 if attempt < max_retries - 1:
-                    time.sleep(2)  # 等待2秒后重试
+                    rate_limiter.stats.record('retried')
+                    metrics.inc('llm_retries_total', model=self.model)
+                    time.sleep(rate_limiter.backoff_delay(attempt))
                 else:
                     return "❌ 评分失败：请求超时，请稍后重试"
 
@@ -147,36 +307,126 @@ class PythonCodeGrader:
 
         return "❌ 评分失败：达到最大重试次数"
 
-    def batch_evaluate(self, submissions: List[Dict]) -> Dict:
+    @staticmethod
+    def _read_stream(response, on_delta: Callable[[str], None]) -> str:
+        """读取OpenAI兼容接口的流式响应（SSE），逐段回调并返回完整文本"""
+        response.encoding = 'utf-8'
+        parts = []
+        done = False
+        # [DONE]之后继续读到响应体结束，否则连接不能放回连接池复用
+        for line in response.iter_lines(decode_unicode=True):
+            if done or not line or not line.startswith('data:'):
+                continue
+            payload = line[len('data:'):].strip()
+            if payload == '[DONE]':
+                done = True
+                continue
+            delta = json.loads(payload)['choices'][0].get('delta', {}).get('content')
+            if delta:
+                parts.append(delta)
+                on_delta(delta)
+        return "".join(parts)
+
+    def batch_evaluate(self, submissions: List[Dict], max_workers: int = None) -> Dict:
         """
-        批量评估多个代码提交
+        批量评估多个代码提交（并发执行）
 
         Args:
-            submissions: 提交列表，每个元素包含 'code' 和 'requirements'
+            submissions: 提交列表，每个元素包含 'code' 和 'requirements'，
+                         或包含整份作业内容 'content'
+            max_workers: 最大并发数，默认使用Config.BATCH_CONCURRENCY
 
         Returns:
-            评估结果字典
+            评估结果字典，按提交顺序排列
         """
-        results = {}
-
-        for i, submission in enumerate(submissions, 1):
-            print(f"\n📝 正在评估第 {i}/{len(submissions)} 个提交...")
+        results = dict(self.iter_batch_evaluate(submissions, max_workers))
+        return {f"submission_{i}": results[f"submission_{i}"]
+                for i in range(1, len(submissions) + 1)}
 
-            evaluation = self.evaluate_code(
-                submission['code'],
-                submission['requirements']
-            )
+    def iter_batch_evaluate(self, submissions: List[Dict],
+                            max_workers: int = None) -> Iterator[Tuple[str, Dict]]:
+        """
+        并发评估多个提交，按完成顺序逐个返回结果
 
-            results[f"submission_{i}"] = {
-                'code': submission['code'],
-                'requirements': submission['requirements'],
-                'evaluation': evaluation
-            }
+        Args:
+            submissions: 提交列表，格式同batch_evaluate
+            max_workers: 最大并发数，默认使用Config.BATCH_CONCURRENCY
 
-            # 添加延迟避免API限制
-            time.sleep(1)
+        Yields:
+            (提交编号, 评估结果) 元组
+        """
+        max_workers = max_workers or Config.BATCH_CONCURRENCY
+        total = len(submissions)
+
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="batch-grader") as executor:
+            futures = {executor.submit(self._evaluate_submission, submission): i
+                       for i, submission in enumerate(submissions, 1)}
+
+            for done, future in enumerate(as_completed(futures), 1):
+                i = futures[future]
+                try:
+                    evaluation = future.result()
+                except Exception as e:
+                    evaluation = f"❌ 未知错误：{str(e)}"
+                print(f"\n📝 第 {i} 个提交评估完成 ({done}/{total})")
+
+                result = dict(submissions[i - 1])
+                result['evaluation'] = evaluation
+                yield f"submission_{i}", result
+
+    def _evaluate_submission(self, submission: Dict) -> str:
+        if 'content' in submission:
+            return self.evaluate_code_2(submission['content'])
+        return self.evaluate_code(submission['code'], submission['requirements'])
+
+
+def merge_question_results(results: List[Tuple[int, str]]) -> str:
+    """
+    合并各题评分结果：总分和各维度分数取各题平均，输出格式与SYSTEM_PROMPT一致
+
+    Args:
+        results: [(题号, 该题评分结果), ...]
+
+    Returns:
+        合并后的评分结果；有题目评分失败或无法解析出分数时返回以"❌"开头的错误，由评分队列重试，
+        不用部分题目的分数计算总分
+    """
+    parsed = [parse_grader_output(text) for _, text in results]
+    failed = [(question_id, text) for (question_id, text), scores in zip(results, parsed) if not scores]
+    if failed:
+        details = "\n".join(f"题目{question_id}：{text}" for question_id, text in failed)
+        return f"❌ 评分失败：{len(failed)}道题评分失败或无法解析出分数\n{details}"
+
+    def average(field):
+        values = [scores[field] for scores in parsed if scores and scores[field] is not None]
+        return f"{sum(values) / len(values):.1f}" if values else "-"
+
+    lines = [
+        f"完成题目数量：{len(results)}",
+        f"★★总分★★:{average('total')}",
+        "★★详细评分★★",
+    ]
+    lines += [f'{label}:"{average(field)}"' for field, label in DIMENSIONS.items()]
+    for question_id, text in results:
+        lines.append(f"\n--- 题目{question_id} ---")
+        lines.append(text)
+    return "\n".join(lines)
+
+
+def batch_grade_files(file_paths: List[str], max_workers: int = None):
+    """命令行批量评分：并发评估多个作业文件，按完成顺序输出结果"""
+    from document_extractor import extract_text
+
+    grader = PythonCodeGrader()
+    submissions = [{'file': path, 'content': extract_text(path)} for path in file_paths]
+
+    start = time.time()
+    for key, result in grader.iter_batch_evaluate(submissions, max_workers):
+        print(f"\n📊 {result['file']} 评估结果：")
+        print(result['evaluation'])
+        print("-" * 30)
+    print(f"\n📦 批量评估完成！共 {len(submissions)} 份，耗时 {time.time() - start:.1f}s")
 
-        return results
 
 def main():
     """主函数 - 演示使用方法"""
@@ -281,5 +531,16 @@ def main():
         print(f"❌ 运行错误：{e}")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Python程序判分助手")
+    parser.add_argument("--batch", nargs="+", metavar="FILE",
+                        help="并发批量评分的作业文件（.docx或文本文件）")
+    parser.add_argument("--concurrency", type=int, default=None,
+                        help=f"最大并发数（默认 {Config.BATCH_CONCURRENCY}）")
+    args = parser.parse_args()
+
+    Config.validate_config()
+    if args.batch:
+        batch_grade_files(args.batch, args.concurrency)
+    else:
+        main()
 
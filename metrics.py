@@ -0,0 +1,135 @@
+# metrics.py
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# 默认的耗时分桶（秒），覆盖从数据库查询到大模型调用的时间范围
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# 计数类直方图的分桶（例如每个请求的SQL查询数）
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+# 各指标的说明，输出为Prometheus的HELP行
+HELP = {
+    'http_request_duration_seconds': '请求处理耗时（按路由）',
+    'http_request_sql_queries': '每个请求执行的SQL查询数（按路由）',
+    'http_request_sql_seconds': '每个请求的SQL查询总耗时（按路由）',
+    'docx_extract_seconds': 'Word文档文本提取耗时',
+    'llm_request_seconds': '大模型接口调用耗时（含重试）',
+    'llm_retries_total': '大模型接口重试次数',
+    'llm_tokens_total': '大模型接口估算的token数（prompt为输入，completion为输出）',
+    'tts_render_seconds': '评分语音合成耗时',
+}
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels, extra=None):
+    items = list(labels)
+    if extra:
+        items.append(extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in items) + "}"
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """累加计数器"""
+
+    kind = 'counter'
+
+    def __init__(self, name):
+        self.name = name
+        self._values = {}
+
+    def inc(self, labels, amount=1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        for labels, value in sorted(self._values.items()):
+            yield f"{self.name}{_format_labels(labels)} {_format_value(value)}"
+
+
+class Histogram:
+    """直方图：按分桶统计观测值的分布，同时记录总和与次数"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.buckets = tuple(buckets)
+        self._values = {}  # labels -> [各分桶计数..., 总和, 次数]
+
+    def observe(self, labels, value):
+        series = self._values.get(labels)
+        if series is None:
+            series = self._values[labels] = [0] * len(self.buckets) + [0.0, 0]
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            series[index] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self):
+        for labels, series in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                yield f"{self.name}_bucket{_format_labels(labels, ('le', bound))} {cumulative}"
+            yield f"{self.name}_bucket{_format_labels(labels, ('le', '+Inf'))} {series[-1]}"
+            yield f"{self.name}_sum{_format_labels(labels)} {_format_value(series[-2])}"
+            yield f"{self.name}_count{_format_labels(labels)} {series[-1]}"
+
+
+class MetricsRegistry:
+    """进程内的指标注册表，按Prometheus文本格式输出"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, **kwargs):
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = self._metrics[name] = cls(name, **kwargs)
+        return metric
+
+    def inc(self, name, amount=1, **labels):
+        """计数器加amount"""
+        with self._lock:
+            self._get(Counter, name).inc(tuple(sorted(labels.items())), amount)
+
+    def observe(self, name, value, buckets=DEFAULT_BUCKETS, **labels):
+        """向直方图记录一个观测值"""
+        with self._lock:
+            self._get(Histogram, name, buckets=buckets).observe(tuple(sorted(labels.items())), value)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """记录代码块耗时（秒）的上下文管理器"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def render(self):
+        """Prometheus文本格式（text/plain; version=0.0.4）"""
+        lines = []
+        with self._lock:
+            for name, metric in sorted(self._metrics.items()):
+                if name in HELP:
+                    lines.append(f"# HELP {name} {HELP[name]}")
+                lines.append(f"# TYPE {name} {metric.kind}")
+                lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# 进程内共享的指标注册表
+metrics = MetricsRegistry()
@@ -0,0 +1,84 @@
+# migrations.py
+import csv
+from datetime import datetime
+
+from sqlalchemy import bindparam, inspect, text
+from sqlalchemy.exc import IntegrityError
+
+
+def upgrade_schema(db):
+    """
+    升级已有数据库的表结构
+
+    db.create_all()只会创建不存在的表，不会给已存在的表补充新增的索引和约束，
+    这里对已有数据库逐项补齐，可以在每次启动时重复执行。需要在app_context中调用。
+    已有数据违反新增的唯一索引时直接报错，不会自动删除数据，
+    需要先执行 flask --app app dedupe-submissions 检查并处理重复提交。
+    """
+    _add_missing_columns(db)
+    _create_missing_indexes(db)
+
+
+def _add_missing_columns(db):
+    """给已有的表补充模型中新增的可空列"""
+    inspector = inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            column_type = column.type.compile(dialect=db.engine.dialect)
+            db.session.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}'))
+            print(f"🔧 已为表 {table.name} 添加列 {column.name}")
+    db.session.commit()
+
+
+def find_duplicate_submissions(db):
+    """查找同一学生对同一作业的重复提交（每组最早的一条不算重复）"""
+    return db.session.execute(text("""
+        SELECT id, assignment_id, student_id, submitted_at, file_path, file_name, grade
+        FROM submission
+        WHERE id NOT IN (
+            SELECT MIN(id) FROM submission GROUP BY assignment_id, student_id
+        )
+        ORDER BY assignment_id, student_id, id""")).mappings().all()
+
+
+def archive_duplicate_submissions(db, duplicates, archive_path):
+    """
+    把重复提交备份到CSV文件后从数据库删除（连同评分任务和评分结果）
+
+    上传的文件不删除，备份中记录了文件路径，需要时可以手工恢复
+
+    Args:
+        duplicates: find_duplicate_submissions()的结果
+        archive_path: 备份文件路径
+    """
+    with open(archive_path, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.DictWriter(f, fieldnames=list(duplicates[0].keys()))
+        writer.writeheader()
+        writer.writerows(dict(row) for row in duplicates)
+
+    params = {'ids': [row['id'] for row in duplicates]}
+    for table in ('grading_job', 'grading_result'):
+        db.session.execute(text(f"DELETE FROM {table} WHERE submission_id IN :ids")
+                           .bindparams(bindparam('ids', expanding=True)), params)
+    db.session.execute(text("DELETE FROM submission WHERE id IN :ids")
+                       .bindparams(bindparam('ids', expanding=True)), params)
+    db.session.commit()
+
+
+def default_archive_path():
+    return f"duplicate_submissions_{datetime.now().strftime('%Y%m%d%H%M%S')}.csv"
+
+
+def _create_missing_indexes(db):
+    """按模型定义创建缺失的索引（已存在的跳过）"""
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                index.create(db.engine, checkfirst=True)
+            except IntegrityError as e:
+                raise RuntimeError(
+                    f"❌ 无法创建唯一索引 {index.name}：表 {table.name} 中存在重复数据，"
+                    f"请先执行 flask --app app dedupe-submissions 检查重复提交") from e
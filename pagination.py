@@ -0,0 +1,72 @@
+# pagination.py
+from flask import request
+
+from config import Config
+
+
+class KeysetPage:
+    """一页查询结果及翻页游标"""
+
+    size_options = Config.PAGE_SIZE_OPTIONS
+
+    def __init__(self, items, page_size, prev_before=None, next_after=None):
+        self.items = items
+        self.page_size = page_size
+        self.prev_before = prev_before  # 上一页：取key小于该值的记录
+        self.next_after = next_after  # 下一页：取key大于该值的记录
+
+    @property
+    def has_prev(self):
+        return self.prev_before is not None
+
+    @property
+    def has_next(self):
+        return self.next_after is not None
+
+
+def get_page_args():
+    """从请求参数中读取翻页游标(after/before)和每页条数(size)"""
+    after = request.args.get('after', type=int)
+    before = request.args.get('before', type=int)
+    page_size = request.args.get('size', Config.DEFAULT_PAGE_SIZE, type=int)
+    if page_size not in Config.PAGE_SIZE_OPTIONS:
+        page_size = Config.DEFAULT_PAGE_SIZE
+    return after, before, page_size
+
+
+def keyset_paginate(query, key_column, after=None, before=None, page_size=None,
+                    key_func=None):
+    """
+    基于键值游标（keyset）的分页，不使用OFFSET，翻到任何一页的代价都相同
+
+    Args:
+        query: 待分页的查询（不要带order_by）
+        key_column: 唯一且有序的排序列，例如 Submission.id
+        after: 返回key大于该值的下一页
+        before: 返回key小于该值的上一页
+        page_size: 每页条数
+        key_func: 从一行结果中取出key的函数，默认取行对象的id属性
+
+    Returns:
+        KeysetPage
+    """
+    page_size = page_size or Config.DEFAULT_PAGE_SIZE
+    key_func = key_func or (lambda row: row.id)
+
+    if before is not None:
+        # 向前翻页：倒序取出再翻转回正序
+        rows = query.filter(key_column < before).order_by(key_column.desc()).limit(page_size + 1).all()
+        has_more = len(rows) > page_size
+        items = list(reversed(rows[:page_size]))
+        prev_before = key_func(items[0]) if has_more and items else None
+        next_after = key_func(items[-1]) if items else None
+        return KeysetPage(items, page_size, prev_before, next_after)
+
+    if after is not None:
+        query = query.filter(key_column > after)
+    rows = query.order_by(key_column).limit(page_size + 1).all()
+    has_more = len(rows) > page_size
+    items = rows[:page_size]
+    prev_before = key_func(items[0]) if after is not None and items else None
+    next_after = key_func(items[-1]) if has_more else None
+    return KeysetPage(items, page_size, prev_before, next_after)
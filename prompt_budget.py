@@ -0,0 +1,163 @@
+# prompt_budget.py
+import re
+
+from config import Config
+
+# 作业中各部分的标题行，用于确定"运行结果"块的结束位置
+SECTION_HEADER = re.compile(r'^\s*(?:题目\s*\d+|第\s*\d+\s*题|源代码|源程序|代码|运行结果|小结|总结|##End)')
+OUTPUT_HEADER = re.compile(r'^\s*运行结果')
+# 题目标题行，例如 "题目1"、"题目 2：..."、"第3题"
+QUESTION_HEADER = re.compile(r'^\s*(?:题目\s*(\d+)|第\s*(\d+)\s*题)')
+
+
+def count_tokens(text):
+    """估算文本的token数（中文约1字1token，其他字符约4个1token）"""
+    cjk = sum(1 for ch in text if ord(ch) > 0x2E80)
+    return cjk + (len(text) - cjk) // 4 + 1
+
+
+def split_questions(homework_content):
+    """
+    把作业内容按题目标题拆分
+
+    Returns:
+        [(题号, 该题的全部文本), ...]，按出现顺序排列；同一题号只取第一次出现的位置
+    """
+    questions = []
+    current_id, current_lines = None, []
+    seen = set()
+    for line in homework_content.splitlines():
+        match = QUESTION_HEADER.match(line)
+        question_id = int(match.group(1) or match.group(2)) if match else None
+        if question_id is not None and question_id not in seen:
+            if current_id is not None:
+                questions.append((current_id, "\n".join(current_lines)))
+            seen.add(question_id)
+            current_id, current_lines = question_id, []
+        if current_id is not None:
+            current_lines.append(line)
+    if current_id is not None:
+        questions.append((current_id, "\n".join(current_lines)))
+    return questions
+
+
+class CompactionReport:
+    """一次提示词压缩的统计"""
+
+    def __init__(self, tokens_before, tokens_after, steps):
+        self.tokens_before = tokens_before
+        self.tokens_after = tokens_after
+        self.steps = steps  # 实际执行的压缩步骤名称
+
+    @classmethod
+    def combine(cls, reports):
+        """合并多次压缩的统计，例如按题目评分时每道题各压缩一次"""
+        steps = []
+        for report in reports:
+            steps += [step for step in report.steps if step not in steps]
+        return cls(sum(report.tokens_before for report in reports),
+                   sum(report.tokens_after for report in reports), steps)
+
+    def __str__(self):
+        steps = "、".join(self.steps) if self.steps else "无需压缩"
+        return f"{self.tokens_before} -> {self.tokens_after} tokens（{steps}）"
+
+
+def _dedupe_whitespace(text):
+    """去掉行尾空白、压缩行内连续空白（保留缩进）和连续空行"""
+    lines = []
+    for line in text.splitlines():
+        stripped = line.rstrip()
+        indent = stripped[:len(stripped) - len(stripped.lstrip())]
+        lines.append(indent + re.sub(r'[ \t　]{2,}', ' ', stripped.lstrip()))
+    return re.sub(r'\n{3,}', '\n\n', "\n".join(lines)) + "\n"
+
+
+def _collapse_repeated_lines(text):
+    """把连续重复的行合并为一行并注明重复次数"""
+    lines = text.splitlines()
+    result = []
+    i = 0
+    while i < len(lines):
+        j = i
+        while j + 1 < len(lines) and lines[j + 1] == lines[i]:
+            j += 1
+        count = j - i + 1
+        if count > 2 and lines[i].strip():
+            result.append(f"{lines[i]}  (以上一行重复 {count} 次)")
+        else:
+            result.extend(lines[i:j + 1])
+        i = j + 1
+    return "\n".join(result) + "\n"
+
+
+def _trim_output_blocks(text, max_lines=None):
+    """截短过长的"运行结果"块，只保留开头和结尾若干行"""
+    max_lines = max_lines or Config.RUN_OUTPUT_MAX_LINES
+    head = max_lines // 2
+    tail = max_lines - head
+    lines = text.splitlines()
+    result = []
+    i = 0
+    while i < len(lines):
+        result.append(lines[i])
+        if not OUTPUT_HEADER.match(lines[i]):
+            i += 1
+            continue
+        # 运行结果块：到下一个部分标题为止
+        j = i + 1
+        while j < len(lines) and not SECTION_HEADER.match(lines[j]):
+            j += 1
+        block = lines[i + 1:j]
+        if len(block) > max_lines:
+            block = block[:head] + [f"...（运行结果过长，省略 {len(block) - max_lines} 行）..."] + block[-tail:]
+        result.extend(block)
+        i = j
+    return "\n".join(result) + "\n"
+
+
+def _truncate(text, budget):
+    """最后手段：按预算截断文本末尾"""
+    if count_tokens(text) <= budget:
+        return text
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if count_tokens(text[:mid]) <= budget:
+            low = mid
+        else:
+            high = mid - 1
+    return text[:low] + "\n...（作业内容过长，已截断）\n"
+
+
+def compact_prompt(text, budget=None):
+    """
+    压缩作业内容使其不超过输入token预算，依次执行：
+    去重空白 -> 合并重复行 -> 截短运行结果 -> 截断
+
+    Args:
+        text: 作业内容
+        budget: 输入token预算，默认使用Config.PROMPT_INPUT_TOKEN_BUDGET
+
+    Returns:
+        (压缩后的内容, CompactionReport)
+    """
+    budget = budget or Config.PROMPT_INPUT_TOKEN_BUDGET
+    tokens_before = count_tokens(text)
+    steps = []
+
+    stages = [
+        ('去重空白', _dedupe_whitespace),
+        ('合并重复行', _collapse_repeated_lines),
+        ('截短运行结果', _trim_output_blocks),
+        ('截断', lambda t: _truncate(t, budget)),
+    ]
+    for name, stage in stages:
+        if count_tokens(text) <= budget:
+            break
+        compacted = stage(text)
+        if compacted != text:
+            steps.append(name)
+            text = compacted
+
+    return text, CompactionReport(tokens_before, count_tokens(text), steps)
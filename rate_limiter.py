@@ -0,0 +1,139 @@
+# rate_limiter.py
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+from config import Config
+
+
+class TokenBucket:
+    """令牌桶：按固定速率补充令牌，令牌不足时阻塞等待"""
+
+    def __init__(self, rate_per_minute, capacity=None):
+        """
+        Args:
+            rate_per_minute: 每分钟补充的令牌数
+            capacity: 桶容量（允许的突发量），默认等于每分钟速率
+        """
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def acquire(self, amount=1):
+        """
+        获取令牌，不足时阻塞等待
+
+        Returns:
+            实际等待的秒数
+        """
+        # 单次请求超过桶容量时按容量计，避免永远等不到
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self.paused_until:
+                    delay = self.paused_until - now
+                elif self.tokens >= amount:
+                    self.tokens -= amount
+                    return waited
+                else:
+                    delay = (amount - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def pause(self, seconds):
+        """暂停发放令牌（收到限流响应时使用）"""
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class RateLimiter:
+    """单个模型的限流器，同时限制每分钟请求数和每分钟token数"""
+
+    def __init__(self, rpm, tpm):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+
+    def acquire(self, tokens):
+        """请求前调用，获取1个请求配额和tokens个token配额，返回等待秒数"""
+        waited = self.requests.acquire(1) + self.tokens.acquire(tokens)
+        if waited > 0:
+            stats.record('throttled')
+        return waited
+
+    def pause(self, seconds):
+        """服务端限流时暂停该模型的所有请求"""
+        self.requests.pause(seconds)
+        self.tokens.pause(seconds)
+
+
+class RateLimitStats:
+    """限流与重试计数器"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {'throttled': 0, 'rate_limited': 0, 'retried': 0}
+
+    def record(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.counters)
+
+
+stats = RateLimitStats()
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(model):
+    """获取模型对应的进程内共享限流器，配额来自Config.RATE_LIMITS"""
+    with _limiters_lock:
+        limiter = _limiters.get(model)
+        if limiter is None:
+            limits = Config.RATE_LIMITS.get(model, Config.DEFAULT_RATE_LIMIT)
+            limiter = RateLimiter(limits['rpm'], limits['tpm'])
+            _limiters[model] = limiter
+        return limiter
+
+
+def parse_retry_after(value):
+    """解析Retry-After响应头（秒数或HTTP日期），无法解析返回None"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt, retry_after=None):
+    """
+    计算第attempt次重试前的等待时间：指数退避加随机抖动，服务端给出Retry-After时以其为准
+
+    Args:
+        attempt: 已失败的次数（从0开始）
+        retry_after: Retry-After响应头的值
+    """
+    server_delay = parse_retry_after(retry_after)
+    if server_delay is not None:
+        return min(server_delay, Config.RETRY_MAX_DELAY)
+    delay = min(Config.RETRY_MAX_DELAY, Config.RETRY_BASE_DELAY * (2 ** attempt))
+    return random.uniform(delay / 2, delay)
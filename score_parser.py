@@ -0,0 +1,66 @@
+# score_parser.py
+import re
+
+# 评分维度：字段名 -> 评分输出中的名称（见Promptconfig.SYSTEM_PROMPT）
+DIMENSIONS = {
+    'correctness': '正确性',
+    'knowledge': '知识点使用',
+    'readability': '可读性',
+    'robustness': '健壮性',
+}
+
+# 各维度满分，用于校验解析结果
+MAX_SCORES = {
+    'total': 100,
+    'correctness': 50,
+    'knowledge': 35,
+    'readability': 10,
+    'robustness': 5,
+}
+
+_NUMBER = r'["\[\s]*(\d+(?:\.\d+)?)'
+
+
+def _find_score(label, text):
+    # 兼容 markdown格式 `正确性:"45"`、`★★总分★★:[90]` 和 JSON格式 `"总分":90`
+    match = re.search(rf'{label}"?\s*★*\s*[:：]{_NUMBER}', text)
+    return float(match.group(1)) if match else None
+
+
+def parse_grader_output(text):
+    """
+    把大模型的评分输出解析为结构化分数
+
+    Args:
+        text: 评分结果文本
+
+    Returns:
+        包含total、各维度分数和question_count的字典；没有解析出任何分数时返回None
+    """
+    if not text or text.startswith("❌"):
+        return None
+
+    scores = {field: _find_score(label, text) for field, label in DIMENSIONS.items()}
+    scores['total'] = _find_score('总分', text)
+
+    # 超出满分的数值视为解析错误
+    for field, value in scores.items():
+        if value is not None and not 0 <= value <= MAX_SCORES[field]:
+            scores[field] = None
+
+    dimension_scores = [scores[field] for field in DIMENSIONS]
+    if scores['total'] is None and all(value is not None for value in dimension_scores):
+        scores['total'] = sum(dimension_scores)
+    if all(value is None for value in scores.values()):
+        return None
+
+    match = re.search(r'完成题目数量\s*[:：]["\[\s]*(\d+)', text)
+    scores['question_count'] = int(match.group(1)) if match else None
+    return scores
+
+
+def format_grade(total):
+    """把总分格式化为Submission.grade保存的字符串"""
+    if total is None:
+        return None
+    return f"{total:g}"
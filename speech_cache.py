@@ -0,0 +1,81 @@
+# speech_cache.py
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from config import Config
+from metrics import metrics
+
+
+class SpeechCache:
+    """评分结果语音缓存：在后台线程中把文本合成为音频文件，按文本哈希缓存，供浏览器播放"""
+
+    def __init__(self, audio_folder=None):
+        self.audio_folder = audio_folder or Config.AUDIO_FOLDER
+        # pyttsx3引擎不是线程安全的，所有合成任务在同一个线程中串行执行
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tts")
+        self._assistant = None
+        self._pending = set()
+        # 合成失败的文本不再重复合成；语音引擎不可用（未安装pyttsx3、服务器没有音频设备）时所有文本都不再合成
+        self._failed = set()
+        self._unavailable = False
+        self._lock = threading.Lock()
+
+    def audio_path(self, text):
+        """文本对应的音频文件路径（不保证已生成）"""
+        digest = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        return os.path.join(self.audio_folder, f"{digest}.{Config.AUDIO_FORMAT}")
+
+    def get(self, text):
+        """已生成的音频文件路径，尚未生成返回None"""
+        path = self.audio_path(text)
+        return path if os.path.exists(path) else None
+
+    def render_async(self, text):
+        """
+        提交后台合成任务，已生成或正在生成的文本不会重复合成
+
+        Returns:
+            音频已生成或正在生成时返回True；合成失败过或语音引擎不可用时返回False
+        """
+        path = self.audio_path(text)
+        with self._lock:
+            if self._unavailable or path in self._failed:
+                return False
+            if path in self._pending or os.path.exists(path):
+                return True
+            self._pending.add(path)
+        self._executor.submit(self._render, text, path)
+        return True
+
+    def _render(self, text, path):
+        try:
+            if self._assistant is None:
+                # pyttsx3在第一次合成时才导入并初始化，关闭语音时不加载
+                try:
+                    from python_speaking import VoiceAssistant
+                    self._assistant = VoiceAssistant()
+                except Exception as e:
+                    print(f"❌ 语音引擎不可用，不再合成语音：{e}")
+                    with self._lock:
+                        self._unavailable = True
+                    return
+            os.makedirs(self.audio_folder, exist_ok=True)
+            # 先写临时文件再改名，避免浏览器读到未写完的音频
+            tmp_path = f"{path}.tmp.{Config.AUDIO_FORMAT}"
+            with metrics.timer('tts_render_seconds'):
+                self._assistant.save(text, tmp_path)
+            os.replace(tmp_path, path)
+            print(f"🔊 语音已生成：{path}")
+        except Exception as e:
+            print(f"❌ 语音合成失败：{e}")
+            with self._lock:
+                self._failed.add(path)
+        finally:
+            with self._lock:
+                self._pending.discard(path)
+
+
+# 进程内共享的语音缓存
+speech_cache = SpeechCache()
@@ -0,0 +1,402 @@
+# static_analysis.py
+import ast
+import re
+import textwrap
+
+import Promptconfig
+from prompt_budget import SECTION_HEADER, OUTPUT_HEADER, split_questions
+from score_parser import DIMENSIONS, MAX_SCORES
+
+# 可以通过语法树检查的知识点
+FEATURES = {
+    'loop': '循环语句',
+    'branch': '分支语句',
+    'slice': '字符串切片',
+    'str_format': 'str.format()',
+    'hex': 'hex()',
+    'pow': 'pow()',
+    'random': 'random库',
+    'try_except': 'try...except异常处理',
+    'str_call': 'str()',
+    'int_call': 'int()',
+}
+
+# Promptconfig.KNOWLEDGE_POINTS中的描述 -> 需要检查的知识点
+KNOWLEDGE_KEYWORDS = [
+    ('循环', 'loop'),
+    ('分支', 'branch'),
+    ('切片', 'slice'),
+    ('format', 'str_format'),
+    ('hex', 'hex'),
+    ('pow', 'pow'),
+    ('random', 'random'),
+    ('try', 'try_except'),
+    ('异常', 'try_except'),
+    ('str()', 'str_call'),
+    ('int()', 'int_call'),
+]
+
+CODE_HEADER = re.compile(r'^\s*(?:源代码|源程序|程序代码|代码)\s*[:：]?\s*$')
+CODE_START = re.compile(r'^(?:import|from|def|class|return|pass|break|continue|print|for|while|if|elif|else|'
+                        r'try|except|finally|with|raise|global|lambda|assert|del)\b')
+CODE_CHARS = re.compile(r'[=()\[\]:]')
+STRING_LITERAL = re.compile(r'\'[^\']*\'|"[^"]*"')
+CJK = re.compile(r'[⺀-鿿＀-￯]')
+SNAKE_CASE = re.compile(r'^_{0,2}[a-z][a-z0-9_]*$|^_$')
+UPPER_CASE = re.compile(r'^[A-Z][A-Z0-9_]*$')
+MAX_LINE_LENGTH = 79
+
+
+def required_features(knowledge_point):
+    """从知识点描述（例如"至少使用hex()、pow()"）中解析需要检查的知识点"""
+    features = []
+    for keyword, feature in KNOWLEDGE_KEYWORDS:
+        if keyword in knowledge_point and feature not in features:
+            features.append(feature)
+    return features
+
+
+def _looks_like_code(line):
+    stripped = line.strip()
+    if stripped.startswith('#'):
+        return True
+    # 字符串和注释中的中文不影响判断
+    without_strings = STRING_LITERAL.sub('', stripped).split('#', 1)[0]
+    if CJK.search(without_strings):
+        return False
+    return bool(CODE_START.match(stripped) or CODE_CHARS.search(without_strings))
+
+
+# Word的自动更正会把直引号改成弯引号，中文输入法下还常输入全角标点，解析前统一转换为ASCII
+_ASCII_PUNCTUATION = str.maketrans({
+    '“': '"', '”': '"', '‘': "'", '’': "'", '（': '(', '）': ')', '【': '[', '】': ']',
+    '，': ',', '：': ':', '；': ';', '＝': '=', '＋': '+', '－': '-', '＊': '*', '／': '/',
+    '＜': '<', '＞': '>', '！': '!', '％': '%', '＃': '#', '［': '[', '］': ']', '｛': '{', '｝': '}',
+    '\xa0': ' ',
+})
+
+
+def _normalize(line):
+    # Word中粘贴的代码常带有全角空格、不换行空格、弯引号和全角标点
+    return line.replace('　', '    ').translate(_ASCII_PUNCTUATION).rstrip()
+
+
+def extract_code(question_text):
+    """
+    从一道题的文本中提取代码
+
+    有"源代码"等标题时取标题到下一个部分标题之间的内容，否则取看起来像代码的连续行
+    """
+    lines = [_normalize(line) for line in question_text.splitlines()]
+    if any(CODE_HEADER.match(line) for line in lines):
+        code_lines, in_code = [], False
+        for line in lines:
+            if CODE_HEADER.match(line):
+                in_code = True
+            elif SECTION_HEADER.match(line):
+                in_code = False
+            elif in_code:
+                code_lines.append(line)
+    else:
+        code_lines, in_output = [], False
+        for line in lines:
+            if OUTPUT_HEADER.match(line):
+                in_output = True
+            elif SECTION_HEADER.match(line):
+                in_output = False
+            elif not in_output and (not line.strip() or _looks_like_code(line)):
+                code_lines.append(line)
+    return textwrap.dedent("\n".join(code_lines)).strip("\n")
+
+
+def _has_output(question_text):
+    """题目中是否附有非空的运行结果"""
+    in_output = False
+    for line in question_text.splitlines():
+        if OUTPUT_HEADER.match(line):
+            in_output = True
+        elif SECTION_HEADER.match(line):
+            in_output = False
+        elif in_output and line.strip():
+            return True
+    return False
+
+
+class _FeatureVisitor(ast.NodeVisitor):
+    def __init__(self):
+        self.features = set()
+        self.names = set()
+        self.function_count = 0
+        self.docstring_count = 0
+        self.max_depth = 0
+        self._depth = 0
+
+    def _visit_block(self, node):
+        self._depth += 1
+        self.max_depth = max(self.max_depth, self._depth)
+        self.generic_visit(node)
+        self._depth -= 1
+
+    def visit_For(self, node):
+        self.features.add('loop')
+        self._visit_block(node)
+
+    visit_While = visit_For
+    visit_AsyncFor = visit_For
+
+    def visit_comprehension(self, node):
+        self.features.add('loop')
+        self.generic_visit(node)
+
+    def visit_If(self, node):
+        self.features.add('branch')
+        self._visit_block(node)
+
+    def visit_IfExp(self, node):
+        self.features.add('branch')
+        self.generic_visit(node)
+
+    def visit_Try(self, node):
+        if node.handlers:
+            self.features.add('try_except')
+        self._visit_block(node)
+
+    visit_TryStar = visit_Try
+
+    def visit_With(self, node):
+        self._visit_block(node)
+
+    def visit_Subscript(self, node):
+        if isinstance(node.slice, ast.Slice):
+            self.features.add('slice')
+        self.generic_visit(node)
+
+    def visit_Call(self, node):
+        func = node.func
+        if isinstance(func, ast.Attribute) and func.attr == 'format':
+            self.features.add('str_format')
+        if isinstance(func, ast.Name):
+            name_features = {'hex': 'hex', 'pow': 'pow', 'str': 'str_call', 'int': 'int_call'}
+            if func.id in name_features:
+                self.features.add(name_features[func.id])
+        self.generic_visit(node)
+
+    def visit_Import(self, node):
+        if any(alias.name.split('.')[0] == 'random' for alias in node.names):
+            self.features.add('random')
+        self.generic_visit(node)
+
+    def visit_ImportFrom(self, node):
+        if node.module and node.module.split('.')[0] == 'random':
+            self.features.add('random')
+        self.generic_visit(node)
+
+    def visit_FunctionDef(self, node):
+        self.function_count += 1
+        self.names.add(node.name)
+        if ast.get_docstring(node):
+            self.docstring_count += 1
+        for arg in node.args.args:
+            self.names.add(arg.arg)
+        self._visit_block(node)
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Name(self, node):
+        if isinstance(node.ctx, ast.Store):
+            self.names.add(node.id)
+        self.generic_visit(node)
+
+
+class CodeAnalysis:
+    """一段代码的静态分析结果"""
+
+    def __init__(self, code):
+        self.code = code
+        lines = code.splitlines()
+        self.code_lines = sum(1 for line in lines if line.strip() and not line.strip().startswith('#'))
+        self.comment_lines = sum(1 for line in lines if '#' in STRING_LITERAL.sub('', line))
+        self.long_lines = sum(1 for line in lines if len(line) > MAX_LINE_LENGTH)
+        self.style_issues = sum(1 for line in lines if line != line.rstrip() or '\t' in line
+                                or line.rstrip().endswith(';'))
+        self.syntax_error = None
+        self.features = set()
+        self.bad_names = []
+        self.function_count = 0
+        self.docstring_count = 0
+        self.max_depth = 0
+        if not code.strip():
+            return
+        try:
+            tree = ast.parse(code)
+        except SyntaxError as e:
+            self.syntax_error = f"第{e.lineno}行 {e.msg}"
+            return
+        visitor = _FeatureVisitor()
+        visitor.visit(tree)
+        self.features = visitor.features
+        self.bad_names = sorted(name for name in visitor.names
+                                if not SNAKE_CASE.match(name) and not UPPER_CASE.match(name))
+        self.function_count = visitor.function_count
+        self.docstring_count = visitor.docstring_count
+        self.max_depth = visitor.max_depth
+
+    @property
+    def has_code(self):
+        return self.code_lines > 0
+
+    @property
+    def parsed(self):
+        return self.has_code and self.syntax_error is None
+
+
+class QuestionAnalysis:
+    """一道题的分析结果：代码分析、知识点要求和是否附有运行结果"""
+
+    def __init__(self, question_id, text, knowledge_point=None):
+        self.question_id = question_id
+        self.code = CodeAnalysis(extract_code(text))
+        self.knowledge_point = knowledge_point
+        self.required = required_features(knowledge_point) if knowledge_point else []
+        self.missing = [feature for feature in self.required if feature not in self.code.features]
+        self.has_output = _has_output(text)
+
+    def facts(self):
+        """写入提示词的事实描述"""
+        code = self.code
+        if not code.has_code:
+            return f"题目{self.question_id}：未识别到代码"
+        parts = [f"代码{code.code_lines}行"]
+        if code.syntax_error:
+            parts.append(f"语法错误：{code.syntax_error}")
+        else:
+            parts.append("语法正确")
+            if self.required:
+                checks = "、".join(f"{FEATURES[f]}{'✘' if f in self.missing else '✔'}" for f in self.required)
+                parts.append(f"知识点要求：{checks}")
+            else:
+                used = "、".join(FEATURES[f] for f in FEATURES if f in code.features)
+                parts.append(f"使用的语法：{used or '无'}")
+            if code.bad_names:
+                parts.append(f"不符合PEP8命名的名称：{', '.join(code.bad_names[:5])}")
+        if code.long_lines:
+            parts.append(f"超过{MAX_LINE_LENGTH}字符的行{code.long_lines}行")
+        parts.append(f"注释{code.comment_lines}行")
+        if not self.has_output:
+            parts.append("未附运行结果")
+        return f"题目{self.question_id}：" + "；".join(parts)
+
+    def scores(self):
+        """本地评分：按语法、知识点、规范性估算各维度分数"""
+        code = self.code
+        if not code.has_code:
+            return {'correctness': 0, 'knowledge': 0, 'readability': 0, 'robustness': 0}
+        if not code.parsed:
+            correctness = MAX_SCORES['correctness'] * 0.2
+            knowledge = 0
+        else:
+            correctness = MAX_SCORES['correctness'] * (1.0 if self.has_output else 0.8)
+            covered = 1 - len(self.missing) / len(self.required) if self.required else 1.0
+            knowledge = MAX_SCORES['knowledge'] * covered
+        penalty = min(3, code.long_lines) + min(3, len(code.bad_names)) + min(2, code.style_issues)
+        if code.comment_lines == 0:
+            penalty += 2
+        readability = max(0, MAX_SCORES['readability'] - penalty)
+        if not code.parsed:
+            readability = min(readability, MAX_SCORES['readability'] / 2)
+        if 'try_except' in code.features:
+            robustness = MAX_SCORES['robustness']
+        elif 'branch' in code.features:
+            robustness = MAX_SCORES['robustness'] * 0.6
+        else:
+            robustness = MAX_SCORES['robustness'] * 0.2
+        return {'correctness': round(correctness), 'knowledge': round(knowledge),
+                'readability': round(readability), 'robustness': round(robustness)}
+
+
+class SubmissionAnalysis:
+    """整份作业的静态分析结果"""
+
+    def __init__(self, content, homework_id=None):
+        knowledge_points = Promptconfig.KNOWLEDGE_POINTS.get(homework_id, [])
+        questions = split_questions(content) or [(1, content)]
+        self.questions = [
+            QuestionAnalysis(question_id, text,
+                             knowledge_points[question_id - 1] if 0 < question_id <= len(knowledge_points) else None)
+            for question_id, text in questions
+        ]
+
+    @property
+    def all_failed(self):
+        """
+        识别到了代码，但全部无法通过语法检查（不需要大模型也能确定结果）
+
+        附有运行结果的题目说明代码实际运行过，语法检查失败更可能是提取不准确，不算失败
+        """
+        with_code = [q for q in self.questions if q.code.has_code]
+        return bool(with_code) and all(not q.code.parsed and not q.has_output for q in with_code)
+
+    def facts(self, question_id=None):
+        """写入提示词的静态分析结果，question_id为None时包含所有题目"""
+        lines = [q.facts() for q in self.questions if question_id is None or q.question_id == question_id]
+        if not lines:
+            return ""
+        return "【静态分析结果（程序自动生成，供评分参考）】\n" + "\n".join(lines)
+
+    def question_facts(self):
+        """按题目评分时使用：题号到该题静态分析结果的映射"""
+        return {q.question_id: self.facts(q.question_id) for q in self.questions}
+
+    def local_grade(self):
+        """不调用大模型，直接根据静态分析结果评分，输出格式与SYSTEM_PROMPT一致"""
+        per_question = [q.scores() for q in self.questions]
+        scores = {dimension: round(sum(s[dimension] for s in per_question) / len(per_question))
+                  for dimension in DIMENSIONS}
+        total = sum(scores.values())
+
+        strengths, weaknesses, suggestions = [], [], []
+        parsed = [q for q in self.questions if q.code.parsed]
+        if parsed:
+            strengths.append(f"{len(parsed)}道题代码语法正确")
+        for q in self.questions:
+            if not q.code.has_code:
+                weaknesses.append(f"题目{q.question_id}未识别到代码")
+            elif q.code.syntax_error:
+                weaknesses.append(f"题目{q.question_id}语法错误（{q.code.syntax_error}）")
+                suggestions.append(f"运行并修正题目{q.question_id}的代码")
+            elif q.missing:
+                weaknesses.append(f"题目{q.question_id}未使用{'、'.join(FEATURES[f] for f in q.missing)}")
+                suggestions.append(f"题目{q.question_id}按要求使用{'、'.join(FEATURES[f] for f in q.missing)}")
+            elif q.required:
+                strengths.append(f"题目{q.question_id}使用了要求的知识点")
+        if any(q.code.bad_names or q.code.long_lines for q in parsed):
+            suggestions.append("按PEP8规范命名变量、控制每行长度")
+        if not any('try_except' in q.code.features for q in parsed):
+            suggestions.append("增加输入校验和异常处理")
+
+        completed = sum(1 for q in self.questions if q.code.has_code)
+        return (f"完成题目数量：{completed}\n"
+                f"★★总分★★:{total}\n"
+                f"★★详细评分★★\n"
+                f"正确性:\"{scores['correctness']}\"\n"
+                f"知识点使用:\"{scores['knowledge']}\",\n"
+                f"可读性:\"{scores['readability']}\",\n"
+                f"健壮性:\"{scores['robustness']}\",\n"
+                f"优点:\"{'；'.join(strengths) or '无'}\",\n"
+                f"缺点:\"{'；'.join(weaknesses) or '无'}\",\n"
+                f"建议:\"{'；'.join(suggestions) or '无'}\"\n"
+                f"（本地静态分析评分，未经大模型评估）")
+
+
+def analyze_submission(content, homework_id=None):
+    """
+    对作业内容做本地静态分析
+
+    Args:
+        content: 作业文本（Word文档提取的文本）
+        homework_id: 作业编号，对应Promptconfig.KNOWLEDGE_POINTS的键，用于检查知识点
+
+    Returns:
+        SubmissionAnalysis
+    """
+    return SubmissionAnalysis(content, homework_id)
@@ -0,0 +1,190 @@
+# student_import.py
+import csv
+import io
+import re
+import zipfile
+from xml.etree import ElementTree
+
+from config import Config
+
+# 导入文件的列名，支持中英文表头
+COLUMN_ALIASES = {
+    'username': ('username', '用户名', '学号', '账号'),
+    'name': ('name', '姓名'),
+    'password': ('password', '密码'),
+    'email': ('email', '邮箱'),
+}
+REQUIRED_COLUMNS = ('username', 'name')
+MAX_LENGTHS = {'username': 80, 'name': 100, 'password': 120, 'email': 120}
+EMAIL_PATTERN = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+
+# IN查询每批的参数个数，低于旧版SQLite的999个参数上限
+QUERY_BATCH_SIZE = 900
+
+_XLSX_NS = {'m': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+_REL_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id'
+
+
+def _read_csv(data):
+    # Excel保存的中文CSV常见GBK编码
+    for encoding in ('utf-8-sig', 'gbk'):
+        try:
+            text = data.decode(encoding)
+            break
+        except UnicodeDecodeError:
+            continue
+    else:
+        raise ValueError('无法识别CSV文件的编码，请保存为UTF-8格式')
+    return list(csv.reader(io.StringIO(text)))
+
+
+def _column_index(cell_ref):
+    match = re.match(r'[A-Z]+', cell_ref)
+    if match is None:
+        raise IndexError(cell_ref)
+    letters = match.group()
+    index = 0
+    for letter in letters:
+        index = index * 26 + ord(letter) - ord('A') + 1
+    return index - 1
+
+
+def _read_xlsx(data):
+    """读取XLSX第一个工作表的单元格文本（不依赖openpyxl）"""
+    try:
+        archive = zipfile.ZipFile(io.BytesIO(data))
+    except zipfile.BadZipFile:
+        raise ValueError('XLSX文件已损坏')
+    names = set(archive.namelist())
+
+    shared_strings = []
+    if 'xl/sharedStrings.xml' in names:
+        root = ElementTree.fromstring(archive.read('xl/sharedStrings.xml'))
+        for item in root.findall('m:si', _XLSX_NS):
+            shared_strings.append(''.join(t.text or '' for t in item.iter(f"{{{_XLSX_NS['m']}}}t")))
+
+    # 按workbook.xml找到第一个工作表
+    sheet_path = 'xl/worksheets/sheet1.xml'
+    if 'xl/workbook.xml' in names and 'xl/_rels/workbook.xml.rels' in names:
+        sheet = ElementTree.fromstring(archive.read('xl/workbook.xml')).find('m:sheets/m:sheet', _XLSX_NS)
+        rels = ElementTree.fromstring(archive.read('xl/_rels/workbook.xml.rels'))
+        for rel in rels:
+            if sheet is not None and rel.get('Id') == sheet.get(_REL_NS):
+                target = rel.get('Target').lstrip('/')
+                sheet_path = target if target.startswith('xl/') else f"xl/{target}"
+    if sheet_path not in names:
+        raise ValueError('XLSX文件中没有工作表')
+
+    rows = []
+    root = ElementTree.fromstring(archive.read(sheet_path))
+    for row in root.iterfind('m:sheetData/m:row', _XLSX_NS):
+        values = []
+        for position, cell in enumerate(row.findall('m:c', _XLSX_NS)):
+            index = _column_index(cell.get('r')) if cell.get('r') else position
+            values.extend([''] * (index - len(values)))
+            cell_type = cell.get('t')
+            if cell_type == 'inlineStr':
+                value = ''.join(t.text or '' for t in cell.iter(f"{{{_XLSX_NS['m']}}}t"))
+            else:
+                v = cell.find('m:v', _XLSX_NS)
+                value = v.text if v is not None and v.text is not None else ''
+                if cell_type == 's' and value:
+                    if not value.isdigit():
+                        raise IndexError(value)
+                    value = shared_strings[int(value)]
+                elif cell_type is None and value.endswith('.0'):
+                    # 纯数字学号在Excel中保存为数值
+                    value = value[:-2]
+            values.append(value)
+        rows.append(values)
+    return rows
+
+
+def read_table(data, filename):
+    """读取上传的CSV/XLSX文件，返回行列表（第一行为表头）"""
+    if filename.lower().endswith('.xlsx'):
+        try:
+            return _read_xlsx(data)
+        except (IndexError, KeyError, zipfile.BadZipFile, ElementTree.ParseError):
+            # 共享字符串序号越界、缺少文件、XML格式错误等
+            raise ValueError('XLSX文件已损坏或格式不正确')
+    if filename.lower().endswith('.csv'):
+        return _read_csv(data)
+    raise ValueError('只支持CSV或XLSX文件')
+
+
+def parse_students(rows):
+    """
+    校验导入的学生数据
+
+    Returns:
+        (有效记录列表, 错误列表)，记录为{'row': 行号, 'username': ..., 'name': ..., 'password': ..., 'email': ...}，
+        错误为(行号, 错误信息)，行号与Excel中的行号一致
+    """
+    if not rows:
+        raise ValueError('文件为空')
+    header = [str(cell).strip().lower() for cell in rows[0]]
+    columns = {}
+    for field, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias.lower() in header:
+                columns[field] = header.index(alias.lower())
+                break
+    missing = [COLUMN_ALIASES[field][1] for field in REQUIRED_COLUMNS if field not in columns]
+    if missing:
+        raise ValueError(f"缺少必需的列：{'、'.join(missing)}")
+
+    records, errors = [], []
+    seen = {}
+    for row_number, row in enumerate(rows[1:], start=2):
+        record = {field: (str(row[index]).strip() if index < len(row) else '') for field, index in columns.items()}
+        if not any(record.values()):
+            continue  # 跳过空行
+        record['password'] = record.get('password') or Config.IMPORT_DEFAULT_PASSWORD
+        record['email'] = record.get('email') or None
+
+        problems = [f"{COLUMN_ALIASES[field][1]}不能为空" for field in REQUIRED_COLUMNS if not record[field]]
+        problems += [f"{COLUMN_ALIASES[field][1]}超过{limit}个字符"
+                     for field, limit in MAX_LENGTHS.items() if record.get(field) and len(record[field]) > limit]
+        if record['email'] and not EMAIL_PATTERN.match(record['email']):
+            problems.append('邮箱格式不正确')
+        if record['username'] in seen:
+            problems.append(f"用户名与第{seen[record['username']]}行重复")
+        if problems:
+            errors.append((row_number, '；'.join(problems)))
+            continue
+        seen[record['username']] = row_number
+        record['row'] = row_number
+        records.append(record)
+    return records, errors
+
+
+def find_existing_usernames(db, user_model, usernames):
+    """查询已存在的用户名（按批IN查询，不逐个查询）"""
+    usernames = list(usernames)
+    existing = set()
+    for start in range(0, len(usernames), QUERY_BATCH_SIZE):
+        batch = usernames[start:start + QUERY_BATCH_SIZE]
+        existing.update(db.session.execute(
+            db.select(user_model.username).where(user_model.username.in_(batch))).scalars())
+    return existing
+
+
+def import_students(db, user_model, records):
+    """
+    批量创建学生账号：一次查出冲突的用户名，其余记录在同一个事务中批量插入
+
+    Returns:
+        (导入数量, 错误列表)
+    """
+    existing = find_existing_usernames(db, user_model, (record['username'] for record in records))
+    errors = [(record['row'], '用户名已存在') for record in records if record['username'] in existing]
+    mappings = [
+        {'username': record['username'], 'password': record['password'], 'role': 'student',
+         'name': record['name'], 'email': record['email']}
+        for record in records if record['username'] not in existing
+    ]
+    if mappings:
+        db.session.bulk_insert_mappings(user_model, mappings)
+        db.session.commit()
+    return len(mappings), errors
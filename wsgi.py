@@ -0,0 +1,5 @@
+# wsgi.py
+# WSGI服务器的入口，例如 gunicorn -w 4 wsgi:app
+from app import create_app
+
+app = create_app()
@@ -0,0 +1,103 @@
+# zip_stream.py
+import io
+import os
+import re
+import time
+import zipfile
+
+# 已经压缩过的文件类型直接存储，不再重复压缩
+STORED_EXTENSIONS = {'.docx', '.pdf', '.zip', '.png', '.jpg', '.jpeg'}
+CHUNK_SIZE = 64 * 1024
+
+# 压缩包内路径中不允许出现的字符：路径分隔符、控制字符和Windows保留字符
+_UNSAFE_NAME_CHARS = re.compile(r'[\x00-\x1f/\\:*?"<>|]')
+
+
+class _ZipOutput(io.RawIOBase):
+    """只追加、不可回退的输出缓冲，zipfile写入后由生成器取走数据"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def safe_archive_name(name):
+    """
+    把用户填写的内容（如姓名）转换为压缩包内安全的路径片段，保留中文
+
+    去掉路径分隔符、控制字符、".."和首尾的"."，解压时不会写到目标文件夹之外；
+    结果为空时返回空字符串，由调用方使用其他名称
+    """
+    name = _UNSAFE_NAME_CHARS.sub('', str(name or ''))
+    return re.sub(r'\.{2,}', '', name).strip(' .')
+
+
+def _zip_info(arcname, source):
+    if not isinstance(source, str):
+        info = zipfile.ZipInfo(arcname, time.localtime()[:6])
+    else:
+        info = zipfile.ZipInfo.from_file(source, arcname)
+    extension = os.path.splitext(arcname)[1].lower()
+    info.compress_type = zipfile.ZIP_STORED if extension in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+    return info
+
+
+def _read_chunks(path, chunk_size):
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+def stream_zip(entries, chunk_size=CHUNK_SIZE):
+    """
+    边读取文件边生成ZIP数据，不在磁盘上生成临时压缩包，也不把整个压缩包放在内存里
+
+    Args:
+        entries: 可迭代的(压缩包内路径, 来源)，来源为文件路径、bytes或逐块产生bytes的可迭代对象；
+            可以是生成器，前面的文件发送完后才会取下一项
+        chunk_size: 每次读取文件的字节数
+
+    Yields:
+        ZIP数据块
+    """
+    output = _ZipOutput()
+    # 输出不可回退，zipfile使用数据描述符记录每个文件的大小和CRC
+    with zipfile.ZipFile(output, mode='w', allowZip64=True) as archive:
+        for arcname, source in entries:
+            info = _zip_info(arcname, source)
+            with archive.open(info, mode='w', force_zip64=True) as dest:
+                if isinstance(source, bytes):
+                    chunks = [source]
+                elif isinstance(source, str):
+                    chunks = _read_chunks(source, chunk_size)
+                else:
+                    chunks = source
+                for chunk in chunks:
+                    dest.write(chunk)
+                    data = output.drain()
+                    if data:
+                        yield data
+            data = output.drain()
+            if data:
+                yield data
+    # 中央目录
+    yield output.drain()